@@ -0,0 +1,93 @@
+"""
+Startup benchmark for the API.
+
+Starts the app in fresh interpreters and reports, per run and as medians:
+  import       - seconds to import main
+  startup      - seconds until startup hooks finish and requests are accepted
+  health       - first /api/health request after startup
+  first_stats  - first /api/dashboard/stats request (builds services if still cold)
+  ready        - seconds from process start until /api/health/components reports ready
+
+The medians of import and startup are checked against a budget, and the
+script exits with status 1 when either is over it:
+  STARTUP_IMPORT_BUDGET_SECONDS   (default 1.0)
+  STARTUP_BUDGET_SECONDS          (default 2.0)
+
+Usage: python benchmark_startup.py [runs]
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+BUDGETS = {
+    "import": float(os.getenv("STARTUP_IMPORT_BUDGET_SECONDS", "1.0")),
+    "startup": float(os.getenv("STARTUP_BUDGET_SECONDS", "2.0")),
+}
+
+CHILD = r"""
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+result = {"import": imported - start}
+with TestClient(main.app) as client:
+    result["startup"] = time.perf_counter() - start
+    t = time.perf_counter()
+    client.get("/api/health")
+    result["health"] = time.perf_counter() - t
+    t = time.perf_counter()
+    client.get("/api/dashboard/stats")
+    result["first_stats"] = time.perf_counter() - t
+    while not client.get("/api/health/components").json()["ready"]:
+        if time.perf_counter() - start > 120:
+            break
+        time.sleep(0.05)
+    result["ready"] = time.perf_counter() - start
+print("BENCHMARK " + json.dumps(result))
+"""
+
+
+def run_once() -> dict:
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("BENCHMARK "):
+            return json.loads(line[len("BENCHMARK "):])
+    raise RuntimeError(f"Benchmark run failed:\n{completed.stderr[-2000:]}")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = []
+    for i in range(runs):
+        result = run_once()
+        results.append(result)
+        print(f"Run {i + 1}: " + ", ".join(f"{name}={value:.3f}s" for name, value in result.items()))
+
+    print("-" * 50)
+    over = []
+    for name in results[0]:
+        median = statistics.median(r[name] for r in results)
+        line = f"{name:>12}: median {median:.3f}s"
+        if name in BUDGETS:
+            line += f" (budget {BUDGETS[name]:.3f}s)"
+            if median > BUDGETS[name]:
+                over.append(name)
+                line += " OVER BUDGET"
+        print(line)
+
+    if over:
+        print(f"Startup budget exceeded: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
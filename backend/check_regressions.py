@@ -0,0 +1,215 @@
+"""
+Regression checks for the dashboard data path.
+
+  parity       - every dashboard endpoint that existed in the baseline
+                 returns the same JSON as the baseline DataProcessor run on
+                 the raw CSV (fields added since are not compared). The baseline processor is read from git
+                 (revision CHECK_BASELINE_REV, default the repository's
+                 first commit).
+  incremental  - after objects in the bucket change, are removed or are
+                 added, an incremental refresh gives the same version, rows
+                 and dashboard output as a cold load of the same listing.
+                 Runs against an in-memory S3 client.
+
+The checks use the local CSV (LOCAL_CSV_PATH) and disable the S3 bucket and
+the dataset snapshot. Exits with status 1 when any check fails.
+
+Usage: python check_regressions.py
+"""
+import os
+import sys
+import types
+import asyncio
+import hashlib
+import subprocess
+
+os.environ["AWS_S3_BUCKET_NAME"] = ""
+os.environ["DATASET_SNAPSHOT_PATH"] = ""
+
+import pandas as pd
+from botocore.exceptions import ClientError
+from fastapi.encoders import jsonable_encoder
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+from main import app
+from fastapi.testclient import TestClient
+from services.s3_service import S3Service
+from services.data_processor import DataProcessor
+
+
+def load_baseline_processor():
+    """Baseline DataProcessor class, imported from git"""
+    revision = os.getenv("CHECK_BASELINE_REV")
+    if not revision:
+        roots = subprocess.run(["git", "rev-list", "--max-parents=0", "HEAD"], cwd=BACKEND_DIR,
+                               capture_output=True, text=True, check=True).stdout.split()
+        revision = roots[-1]
+    source = subprocess.run(["git", "show", f"{revision}:backend/services/data_processor.py"],
+                            cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout
+    module = types.ModuleType("baseline_data_processor")
+    exec(compile(source, f"{revision}:services/data_processor.py", "exec"), module.__dict__)
+    return revision, module.DataProcessor
+
+
+def matches_baseline(expected, actual) -> bool:
+    """
+    Whether ``actual`` has every value of ``expected``. Fields added to a
+    response since the baseline (unset there, like ``sales_by_year``) are
+    not compared.
+    """
+    if isinstance(expected, dict):
+        return (isinstance(actual, dict)
+                and all(value is None or matches_baseline(value, actual.get(key))
+                        for key, value in expected.items()))
+    if isinstance(expected, list):
+        return (isinstance(actual, list) and len(expected) == len(actual)
+                and all(matches_baseline(e, a) for e, a in zip(expected, actual)))
+    return expected == actual
+
+
+def check_parity() -> list:
+    revision, BaselineProcessor = load_baseline_processor()
+    print(f"Endpoint parity against {revision[:12]}...")
+    baseline = BaselineProcessor()
+    df = pd.read_csv(S3Service()._find_local_csv())
+
+    endpoints = {
+        "/api/dashboard/sales-data": lambda: baseline.process_sales_data(df),
+        "/api/dashboard/stats": lambda: baseline.process_dashboard_stats(df),
+        "/api/dashboard/comprehensive": lambda: {
+            "sales_data": baseline.process_sales_data(df),
+            "stats": baseline.process_dashboard_stats(df),
+            "top_products": baseline.process_product_performance(df, limit=20),
+            "categories": baseline.process_category_performance(df),
+            "locations": baseline.process_location_performance(df),
+            "customer_segments": baseline.process_customer_segment_performance(df),
+            "inventory_metrics": baseline.process_inventory_metrics(df)
+        },
+        "/api/products/top?limit=10": lambda: baseline.process_product_performance(df, limit=10),
+        "/api/products/top?limit=30": lambda: baseline.process_product_performance(df, limit=30),
+        "/api/categories": lambda: baseline.process_category_performance(df),
+        "/api/locations": lambda: baseline.process_location_performance(df),
+        "/api/customer-segments": lambda: baseline.process_customer_segment_performance(df),
+        "/api/inventory/metrics": lambda: baseline.process_inventory_metrics(df),
+    }
+
+    failures = []
+    client = TestClient(app)
+    # Twice: the second request is served from the response cache
+    for attempt in ("cold", "cached"):
+        for url, expected in endpoints.items():
+            response = client.get(url)
+            if response.status_code != 200 or not matches_baseline(jsonable_encoder(expected()), response.json()):
+                failures.append(f"parity {url} ({attempt})")
+                print(f"   [ERROR] {url} ({attempt}): status {response.status_code}, output differs")
+    if not failures:
+        print(f"   [OK] {len(endpoints)} endpoints match, cold and cached")
+    return failures
+
+
+class _Body:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def read(self) -> bytes:
+        return self.data
+
+
+class FakeS3Client:
+    """In-memory bucket: keys are listed sorted and IfMatch is honoured, as in S3"""
+
+    def __init__(self, objects: dict):
+        self.objects = dict(objects)
+
+    @staticmethod
+    def etag(data: bytes) -> str:
+        return '"%s"' % hashlib.md5(data).hexdigest()
+
+    def get_paginator(self, name: str):
+        return self
+
+    def paginate(self, Bucket: str, Prefix: str):
+        contents = [{"Key": key, "ETag": self.etag(data), "Size": len(data)}
+                    for key, data in sorted(self.objects.items()) if key.startswith(Prefix)]
+        return [{"Contents": contents}]
+
+    def get_object(self, Bucket: str, Key: str, Range: str = None, IfMatch: str = None):
+        data = self.objects[Key]
+        if IfMatch is not None and IfMatch != self.etag(data):
+            raise ClientError({"Error": {"Code": "PreconditionFailed"},
+                               "ResponseMetadata": {"HTTPStatusCode": 412}}, "GetObject")
+        if Range:
+            start, end = Range[len("bytes="):].split("-")
+            data = data[int(start):int(end) + 1]
+        return {"Body": _Body(data), "ETag": self.etag(data)}
+
+
+def check_incremental() -> list:
+    print("Incremental refresh against cold loads...")
+    with open(S3Service()._find_local_csv(), "rb") as f:
+        header, *rows = [line for line in f.read().splitlines() if line]
+
+    def csv_object(start: int, stop: int) -> bytes:
+        return b"\n".join([header] + rows[start:stop]) + b"\n"
+
+    def service(client: FakeS3Client) -> S3Service:
+        s3 = S3Service()
+        s3.s3_client = client
+        s3.bucket_name = "check"
+        s3.stale_while_revalidate = False
+        return s3
+
+    prefix = S3Service().s3_prefix
+    third = len(rows) // 3
+    client = FakeS3Client({
+        f"{prefix}b.csv": csv_object(0, third),
+        f"{prefix}c.csv": csv_object(third, 2 * third),
+    })
+    incremental = service(client)
+    processor = DataProcessor()
+    processor.process_comprehensive(asyncio.run(incremental.get_dataset()), 20)
+
+    scenarios = [
+        ("append after", lambda: client.objects.update({f"{prefix}d.csv": csv_object(2 * third, len(rows))})),
+        ("append before", lambda: client.objects.update({f"{prefix}a.csv": csv_object(0, 500)})),
+        ("change", lambda: client.objects.update({f"{prefix}b.csv": csv_object(500, third)})),
+        ("remove", lambda: client.objects.pop(f"{prefix}c.csv")),
+    ]
+
+    failures = []
+    for name, mutate in scenarios:
+        mutate()
+        incremental.invalidate()
+        warm = asyncio.run(incremental.get_dataset())
+        cold = asyncio.run(service(client).get_dataset())
+
+        problems = []
+        if warm.version != cold.version:
+            problems.append("version")
+        if not warm.frame.reset_index(drop=True).equals(cold.frame.reset_index(drop=True)):
+            problems.append("rows")
+        expected = jsonable_encoder(DataProcessor().process_comprehensive(cold.frame.copy(), 20))
+        if jsonable_encoder(processor.process_comprehensive(warm, 20)) != expected:
+            problems.append("dashboard output")
+
+        if problems:
+            failures.append(f"incremental {name}")
+            print(f"   [ERROR] {name}: {', '.join(problems)} differ")
+        else:
+            print(f"   [OK] {name}: {len(warm)} rows, same version, rows and output")
+    return failures
+
+
+def main():
+    failures = check_parity() + check_incremental()
+    print("-" * 50)
+    if failures:
+        print(f"Regressions found: {', '.join(failures)}")
+        sys.exit(1)
+    print("[SUCCESS] No regressions found.")
+
+
+if __name__ == "__main__":
+    main()
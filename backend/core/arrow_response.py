@@ -0,0 +1,83 @@
+import importlib.util
+from typing import TYPE_CHECKING, Dict, Optional, Union
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+# pyarrow is only imported once an Arrow response is rendered; without it
+# every response is JSON
+ARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def _quality(accept: str, media_types: tuple) -> float:
+    """Highest q-value the Accept header gives any of the media types"""
+    best = 0.0
+    for entry in accept.split(","):
+        media_type, *params = [part.strip() for part in entry.split(";")]
+        if media_type.lower() not in media_types:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        best = max(best, q)
+    return best
+
+
+def accepts_arrow(accept: Optional[str]) -> bool:
+    """True when the client prefers an Arrow IPC stream over JSON"""
+    if not ARROW_AVAILABLE or not accept:
+        return False
+    arrow = _quality(accept, (ARROW_STREAM_MEDIA_TYPE,))
+    json_quality = _quality(accept, ("application/json", "application/*", "*/*"))
+    return arrow > 0 and arrow >= json_quality
+
+
+def _frame_table(frame: "pd.DataFrame") -> "pa.Table":
+    import pyarrow as pa
+    arrays = {}
+    for name in frame.columns:
+        column = frame[name]
+        if column.dtype == object and len(column) and isinstance(column.iloc[0], dict):
+            # Per-year breakdowns travel as map<string, double>
+            arrays[name] = pa.array(column.tolist(), type=pa.map_(pa.string(), pa.float64()))
+        else:
+            arrays[name] = pa.Array.from_pandas(column)
+    return pa.table(arrays) if arrays else pa.table({})
+
+
+def _list_column(frame: "pd.DataFrame") -> "pa.Array":
+    """One list<struct> value holding every row of the frame"""
+    import pyarrow as pa
+    table = _frame_table(frame)
+    rows = pa.StructArray.from_arrays(
+        [column.combine_chunks() for column in table.columns],
+        fields=list(table.schema)
+    )
+    return pa.ListArray.from_arrays(pa.array([0, len(rows)], pa.int32()), rows)
+
+
+def serialize_arrow(content: Union["pd.DataFrame", Dict[str, "pd.DataFrame"]]) -> bytes:
+    """
+    Encode section frames as an Arrow IPC stream.
+    A single frame becomes a table with one row per record. A dict of
+    frames (the comprehensive dashboard) becomes a one-row table with a
+    list<struct> column per section.
+    """
+    import pyarrow as pa
+    import pyarrow.ipc
+    if isinstance(content, dict):
+        table = pa.table({name: _list_column(frame) for name, frame in content.items()})
+    else:
+        table = _frame_table(content)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
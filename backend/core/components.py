@@ -0,0 +1,67 @@
+import time
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Component(Generic[T]):
+    """
+    A service that is built on first use instead of at import time.
+
+    ``factory`` does the heavy imports and construction. It runs exactly
+    once, under a lock, and its result is kept. ``aget`` builds the
+    component on a worker thread, so a request that arrives while the
+    component is still cold does not block the event loop. Startup warms
+    components the same way in the background.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+        self.state = "cold"
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def is_warm(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        """The component, built now if it is still cold"""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self.state = "loading"
+                    start = time.perf_counter()
+                    try:
+                        instance = self._factory()
+                    except Exception as e:
+                        self.state = "failed"
+                        self.error = str(e)
+                        raise
+                    self.load_seconds = round(time.perf_counter() - start, 3)
+                    self.error = None
+                    self._instance = instance
+                    self.state = "warm"
+        return self._instance
+
+    async def aget(self) -> T:
+        """The component, built on a worker thread if it is still cold"""
+        if self._instance is not None:
+            return self._instance
+        return await asyncio.get_running_loop().run_in_executor(None, self.get)
+
+    def peek(self) -> Optional[T]:
+        """The component if it is already built, without building it"""
+        return self._instance
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
@@ -0,0 +1,70 @@
+import os
+import gzip
+from typing import Callable, Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # Optional encoder; gzip is always available
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Optional encoder; gzip is always available
+    zstandard = None
+
+# Bodies smaller than this are sent uncompressed
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+
+# Bodies are compressed on a cache miss, while the client waits, and the
+# key space (filters, cursors, encodings) makes misses common. Moderate
+# levels get most of the size reduction for a fraction of the CPU: on a
+# 160 KB products page br 11 / zstd 19 / gzip 9 took 327 / 122 / 17 ms
+_ENCODERS: Dict[str, Callable[[bytes], bytes]] = {}
+if brotli is not None:
+    _ENCODERS["br"] = lambda body: brotli.compress(body, quality=5)
+if zstandard is not None:
+    # Compressor objects are not thread-safe, so each call gets its own
+    _ENCODERS["zstd"] = lambda body: zstandard.ZstdCompressor(level=3).compress(body)
+_ENCODERS["gzip"] = lambda body: gzip.compress(body, compresslevel=6, mtime=0)
+
+# Encodings we can produce, most preferred first
+SUPPORTED_ENCODINGS = tuple(_ENCODERS)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Best supported content coding for an Accept-Encoding header, or None
+    for identity. Higher q-values win; ties go to the preferred encoding.
+    """
+    if not accept_encoding:
+        return None
+    qualities: Dict[str, float] = {}
+    for entry in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in entry.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        q = qualities.get(encoding, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """Encode a response body with a supported content coding"""
+    return _ENCODERS[encoding](body)
+
+
+def should_compress(body: bytes, encoding: Optional[str]) -> bool:
+    return encoding is not None and len(body) >= RESPONSE_COMPRESSION_MIN_BYTES
@@ -1,8 +1,5 @@
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
-from pymongo.server_api import ServerApi
-import certifi
 
 load_dotenv()
 
@@ -10,6 +7,8 @@ class Database:
     def __init__(self):
         self.client = None
         self.db = None
+        # Only set once a ping has succeeded; db is assigned before that
+        self.connected = False
 
 db = Database()
 
@@ -26,6 +25,11 @@ async def connect_to_mongo():
     MONGODB_URL = RAW_URL.replace("#", "%23")
     
     DATABASE_NAME = os.getenv("DATABASE_NAME", "nexgen_dashboard")
+
+    # Imported here so the driver does not slow down importing the app
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo.server_api import ServerApi
+    import certifi
     
     try:
         # Using certifi.where() ensures we use the correct root certificates for Atlas SSL
@@ -46,16 +50,22 @@ async def connect_to_mongo():
         # 1. MongoDB Atlas IP Whitelist (allow current IP)
         # 2. Firewall/VPN status
         await db.client.admin.command('ping')
+        db.connected = True
         print(f"Pinged your deployment. Connected to MongoDB: {DATABASE_NAME}")
     except Exception as e:
         print(f"Error connecting to MongoDB: {e}")
         print("TIP: If you see SSL/Handshake errors, check if your IP is whitelisted in MongoDB Atlas Network Access.")
+        # Forget the failed client so the next auth request tries again
+        db.client = None
+        db.db = None
+        db.connected = False
         raise e
 
 async def close_mongo_connection():
     """Close MongoDB connection"""
     if db.client:
         db.client.close()
+        db.connected = False
         print("Closed MongoDB connection")
 
 async def get_users_collection():
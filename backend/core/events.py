@@ -0,0 +1,88 @@
+import os
+import asyncio
+from typing import Any, Dict, Optional, Set
+
+from core.response_cache import serialize_json
+
+# Comment line sent to idle streams so proxies keep the connection open
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+# Pending events per subscriber before the oldest is dropped
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "16"))
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+def format_event(event: str, data: Any, event_id: Optional[str] = None) -> bytes:
+    """One Server-Sent Events message with a JSON payload"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {serialize_json(data).decode('utf-8')}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class EventBroadcaster:
+    """
+    Fans dashboard events out to Server-Sent Events subscribers.
+
+    Each subscriber is a small bounded queue; an event is encoded once and
+    the same bytes are put on every queue, so publishing never waits on a
+    client. A subscriber that falls behind loses its oldest events rather
+    than holding memory for them. Idle subscribers cost one queue and one
+    suspended generator each.
+    """
+
+    def __init__(self, queue_size: int = SSE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self, event: str, data: Dict[str, Any], event_id: Optional[str] = None) -> None:
+        """Queue an event for every subscriber; must be called on the event loop"""
+        message = format_event(event, data, event_id)
+        self.published += 1
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(message)
+
+    async def stream(self, is_disconnected, initial: Optional[bytes] = None,
+                     keepalive: float = SSE_KEEPALIVE_SECONDS):
+        """
+        Subscribe and yield messages as they arrive, starting with
+        ``initial`` if given, with a keepalive comment after ``keepalive``
+        idle seconds. Unsubscribes when the client goes away.
+        """
+        queue = self.subscribe()
+        try:
+            if initial is not None:
+                yield initial
+            while not await is_disconnected():
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE
+        finally:
+            self.unsubscribe(queue)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": self.subscribers,
+            "published": self.published,
+            "dropped": self.dropped,
+        }
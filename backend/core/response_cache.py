@@ -0,0 +1,108 @@
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple, Callable
+
+try:
+    import orjson
+except ImportError:  # Optional fast encoder; the stdlib encoder produces the same bytes
+    orjson = None
+
+# Upper bound on cached bodies for the current dataset version
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+
+
+def cache_key(section: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Canonical key for an endpoint and its query parameters"""
+    if not params:
+        return section
+    query = "&".join(f"{name}={params[name]}" for name in sorted(params) if params[name] is not None)
+    return f"{section}?{query}" if query else section
+
+
+def make_etag(version: str, key: str) -> str:
+    """Strong ETag for a response derived from the dataset version"""
+    digest = hashlib.sha1(f"{version}|{key}".encode('utf-8')).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against the current ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        # Weak comparison, as required for If-None-Match
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def serialize_json(content: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    Encode content the way FastAPI's JSONResponse does (compact, UTF-8).
+    Uses orjson when installed. ``default`` converts values neither
+    encoder knows, e.g. ``fastapi.encoders.jsonable_encoder``.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=default)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=default,
+    ).encode("utf-8")
+
+
+class ResponseCache:
+    """
+    Serialized response bodies (with any extra headers, such as a pagination
+    cursor) keyed by dataset version and request parameters.
+
+    Only the current dataset version is kept: storing a body for a new
+    version drops everything cached for the previous one. Within a version
+    the least recently used entries are evicted past ``max_entries``.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._version: Optional[str] = None
+        self._entries: "OrderedDict[str, Tuple[bytes, Dict[str, str]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version: str, key: str) -> Optional[Tuple[bytes, Dict[str, str]]]:
+        if version != self._version or key not in self._entries:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._entries[key]
+
+    def put(self, version: str, key: str, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+        if version != self._version:
+            self._version = version
+            self._entries.clear()
+        self._entries[key] = (body, headers or {})
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._version = None
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self._version,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -1,13 +1,21 @@
 import os
-from fastapi import FastAPI, HTTPException, Query, UploadFile, File
+import json
+import asyncio
+from datetime import date
+from fastapi import FastAPI, HTTPException, Query, UploadFile, File, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Optional
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
+from typing import List, Dict, Optional, Any
 from dotenv import load_dotenv
-from core.database import connect_to_mongo, close_mongo_connection
+from core.database import db, connect_to_mongo, close_mongo_connection
+from core.response_cache import ResponseCache, cache_key, make_etag, etag_matches, serialize_json
+from core.arrow_response import ARROW_STREAM_MEDIA_TYPE, accepts_arrow, serialize_arrow
+from core.compression import negotiate_encoding, compress_body, should_compress
+from core.events import EventBroadcaster, format_event
+from core.components import Component
+from services.prediction_batcher import PredictionError
 from routers import auth
-from services.s3_service import S3Service
-from services.data_processor import DataProcessor
-from services.ml_service import MLService
 from models.schemas import (
     SalesData, DashboardStats, ProductPerformance,
     CategoryPerformance, LocationPerformance,
@@ -30,25 +38,211 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+def log_background_failure(task: "asyncio.Task") -> None:
+    # Background startup work has no caller to surface its error
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Warning: Background startup task failed: {task.exception()}")
+
 # MongoDB Lifecycle Events
 @app.on_event("startup")
 async def startup_db_client():
-    await connect_to_mongo()
+    # Connect in the background; auth routes connect on demand if this has not finished
+    app.state.mongo_connect = asyncio.ensure_future(connect_to_mongo())
+    app.state.mongo_connect.add_done_callback(log_background_failure)
+
+@app.on_event("startup")
+async def warm_components():
+    # Accept requests right away; services, the dataset snapshot and the
+    # models are loaded in the background
+    app.state.warmup = asyncio.ensure_future(warm_up())
+    app.state.warmup.add_done_callback(log_background_failure)
+
+@app.on_event("startup")
+async def start_dataset_watcher():
+    app.state.dataset_watcher = asyncio.ensure_future(watch_dataset_versions())
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     await close_mongo_connection()
 
+@app.on_event("shutdown")
+async def stop_dataset_watcher():
+    app.state.dataset_watcher.cancel()
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 
 
-# Initialize services
-s3_service = S3Service()
-data_processor = DataProcessor()
-ml_service = MLService()
+def create_s3_service():
+    from services.s3_service import S3Service
+    service = S3Service()
+    service.add_listener(broadcast_dataset_event)
+    return service
+
+
+def create_data_processor():
+    from services.data_processor import DataProcessor
+    return DataProcessor()
+
+
+def create_ml_service():
+    from services.ml_service import MLService
+    return MLService()
+
+
+# Services are built on first use or by the warm-up after startup, so
+# importing this module does not import pandas, boto3 or the models
+s3_service = Component("s3_service", create_s3_service)
+data_processor = Component("data_processor", create_data_processor)
+ml_service = Component("ml_service", create_ml_service)
+COMPONENTS = [s3_service, data_processor, ml_service]
+
+response_cache = ResponseCache()
+# Response builds in flight, so concurrent misses for one body share a build
+response_builds: Dict[tuple, "asyncio.Future"] = {}
+event_broadcaster = EventBroadcaster()
+
+# Largest batch accepted by the batch prediction endpoints
+PREDICT_BATCH_MAX_ROWS = int(os.getenv("PREDICT_BATCH_MAX_ROWS", "10000"))
+
+# How often S3 is checked for a new dataset version while clients are subscribed to events
+DATASET_WATCH_SECONDS = float(os.getenv("DATASET_WATCH_SECONDS", "60"))
+
+
+def broadcast_dataset_event(event: str, payload: Dict[str, Any]) -> None:
+    # Dataset events carry the version as their id, so a reconnecting
+    # client's Last-Event-ID says which version it has seen
+    event_id = payload.get("version") if event == "dataset" else None
+    event_broadcaster.publish(event, payload, event_id)
+
+
+async def warm_up() -> None:
+    """Build every service off the event loop, in the order requests need them"""
+    for component in COMPONENTS:
+        try:
+            service = await component.aget()
+            if component is s3_service:
+                # Serve the local snapshot right away; S3 is revalidated in the background
+                await service.warm_start()
+        except Exception as e:
+            print(f"Warning: Could not warm {component.name}: {e}")
+
+
+async def watch_dataset_versions() -> None:
+    """Revalidate the dataset while anyone is subscribed, so clients never poll"""
+    while True:
+        await asyncio.sleep(DATASET_WATCH_SECONDS)
+        if not event_broadcaster.subscribers:
+            continue
+        try:
+            service = await s3_service.aget()
+            await service.revalidate()
+        except Exception as e:
+            print(f"Warning: Dataset watch failed: {e}")
+
+
+def dashboard_filters(location: Optional[str] = None, category: Optional[str] = None,
+                      customer_segment: Optional[str] = None,
+                      product_id: Optional[int] = None) -> Dict[str, Any]:
+    """Optional row filters accepted by every dashboard endpoint"""
+    return {
+        "location": location,
+        "category": category,
+        "customer_segment": customer_segment,
+        "product_id": product_id,
+    }
+
+
+async def cached_response(request: Request, section: str, method: str,
+                          params: Optional[Dict[str, Any]] = None,
+                          filters: Optional[Dict[str, Any]] = None,
+                          paginated: bool = False, tabular: bool = True) -> Response:
+    """
+    Serve a dashboard section built by the DataProcessor ``method``
+    through the response cache.
+    Bodies are keyed by dataset version, request parameters and filters and
+    carry an ETag derived from them; a matching If-None-Match gets a 304.
+    A paginated build returns ``(content, next_cursor)``; the cursor is sent
+    in the X-Next-Cursor header.
+    A tabular section is sent as an Arrow IPC stream instead of JSON when the
+    Accept header prefers it; the build is then asked for frames.
+    Bodies are compressed with the best encoding in Accept-Encoding
+    (br, zstd or gzip) and the compressed bytes are cached alongside the
+    plain ones, so a cache hit never recompresses.
+    On a miss the build, serialization and compression run on a worker
+    thread, and concurrent requests for the same body share one build.
+    """
+    dataset = await (await s3_service.aget()).get_dataset()
+    build = getattr(await data_processor.aget(), method)
+    params = params or {}
+    key = cache_key(section, {**params, **(filters or {})})
+    if filters is not None:
+        params = {**params, "filters": filters}
+
+    arrow = tabular and accepts_arrow(request.headers.get("accept"))
+    media_type = ARROW_STREAM_MEDIA_TYPE if arrow else "application/json"
+    if arrow:
+        key = f"{key}#arrow"
+        params = {**params, "as_frame": True}
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+
+    def render():
+        content = build(dataset, **params)
+        extra_headers = {}
+        if paginated:
+            content, next_cursor = content
+            if next_cursor:
+                extra_headers["X-Next-Cursor"] = next_cursor
+        if arrow:
+            return serialize_arrow(content), extra_headers
+        return serialize_json(content, default=jsonable_encoder), extra_headers
+
+    def encode(entry):
+        body, extra_headers = entry
+        if not should_compress(body, encoding):
+            return entry
+        return compress_body(body, encoding), {**extra_headers, "Content-Encoding": encoding}
+
+    loop = asyncio.get_running_loop()
+    vary = {"Vary": "Accept, Accept-Encoding" if tabular else "Accept-Encoding"}
+    if dataset.version is None:
+        body, extra_headers = await loop.run_in_executor(None, lambda: encode(render()))
+        return Response(content=body, media_type=media_type, headers={**vary, **extra_headers})
+
+    # Each content coding is a separate representation with its own ETag
+    encoded_key = f"{key}@{encoding}" if encoding else key
+    etag = make_etag(dataset.version, encoded_key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", **vary}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    async def build_entry():
+        # The cache itself is only touched here, on the event loop
+        entry = response_cache.get(dataset.version, key) if encoding else None
+        if entry is None:
+            entry = await loop.run_in_executor(None, render)
+            response_cache.put(dataset.version, key, *entry)
+        if encoding:
+            entry = await loop.run_in_executor(None, encode, entry)
+            response_cache.put(dataset.version, encoded_key, *entry)
+        return entry
+
+    entry = response_cache.get(dataset.version, encoded_key)
+    if entry is None:
+        flight = (dataset.version, encoded_key)
+        pending = response_builds.get(flight)
+        if pending is None:
+            pending = asyncio.ensure_future(build_entry())
+            response_builds[flight] = pending
+            pending.add_done_callback(lambda _: response_builds.pop(flight, None))
+        # Shield the shared build from callers that disconnect mid-wait
+        entry = await asyncio.shield(pending)
+    body, extra_headers = entry
+    return Response(content=body, media_type=media_type, headers={**headers, **extra_headers})
 
 
 @app.get("/")
@@ -63,132 +257,205 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/api/health/components")
+async def component_status():
+    """
+    Which services are warm. Components are built in the background after
+    startup (or by the first request that needs them).
+    """
+    s3 = s3_service.peek()
+    ml = ml_service.peek()
+    return {
+        "ready": all(component.is_warm for component in COMPONENTS) and s3.version is not None,
+        "components": {component.name: component.status() for component in COMPONENTS},
+        "dataset_version": s3.version if s3 is not None else None,
+        "models": ml.get_model_status() if ml is not None else None,
+        "database_connected": db.connected,
+    }
+
+
 @app.get("/api/dashboard/sales-data", response_model=List[SalesData])
-async def get_sales_data():
+async def get_sales_data(request: Request, start: Optional[date] = None, end: Optional[date] = None,
+                         granularity: Optional[str] = Query(None, pattern="^(day|week|month)$"),
+                         filters: Dict[str, Any] = Depends(dashboard_filters)):
     """
     Fetch and process sales data from S3 CSV file.
+    Without parameters returns the 12 calendar months; with start/end/granularity
+    returns day, week or month buckets within the date range.
     """
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
     try:
-        df = await s3_service.fetch_csv_from_s3()
-        return data_processor.process_sales_data(df)
+        return await cached_response(
+            request, "sales-data", "process_sales_data",
+            {"start": start, "end": end, "granularity": granularity}, filters
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/dashboard/stats", response_model=DashboardStats)
-async def get_dashboard_stats():
+async def get_dashboard_stats(request: Request, filters: Dict[str, Any] = Depends(dashboard_filters)):
     """
     Fetch and calculate dashboard statistics.
     """
     try:
-        df = await s3_service.fetch_csv_from_s3()
-        return data_processor.process_dashboard_stats(df)
+        return await cached_response(request, "stats", "process_dashboard_stats", filters=filters)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/dashboard/comprehensive")
-async def get_comprehensive_dashboard():
+async def get_comprehensive_dashboard(request: Request, filters: Dict[str, Any] = Depends(dashboard_filters)):
     """
     Get comprehensive dashboard data including all metrics.
     """
     try:
-        df = await s3_service.fetch_csv_from_s3()
-        
-        return {
-            "sales_data": data_processor.process_sales_data(df),
-            "stats": data_processor.process_dashboard_stats(df),
-            "top_products": data_processor.process_product_performance(df, limit=20),
-            "categories": data_processor.process_category_performance(df),
-            "locations": data_processor.process_location_performance(df),
-            "customer_segments": data_processor.process_customer_segment_performance(df),
-            "inventory_metrics": data_processor.process_inventory_metrics(df)
-        }
+        # One shared aggregation plan for every section
+        return await cached_response(
+            request, "comprehensive", "process_comprehensive",
+            {"product_limit": 20}, filters
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching comprehensive dashboard data: {str(e)}")
 
 
+@app.get("/api/dashboard/events")
+async def dashboard_events(request: Request):
+    """
+    Server-Sent Events stream of dashboard updates.
+    Sends a ``dataset`` event whenever a new dataset version is served and an
+    ``upload`` event when a CSV upload completes. On connect the current
+    version is sent unless the client's Last-Event-ID already matches it.
+    """
+    initial = None
+    version = (await s3_service.aget()).version
+    if version is not None and request.headers.get("last-event-id") != version:
+        initial = format_event("dataset", {"version": version}, version)
+    return StreamingResponse(
+        event_broadcaster.stream(request.is_disconnected, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/api/upload/csv")
 async def upload_csv(file: UploadFile = File(...)):
     """
     Endpoint to upload CSV to S3.
+    The file is validated from its first chunk and streamed to S3 in parts.
     """
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
     
+    service = await s3_service.aget()
     try:
-        content = await file.read()
-        success = await s3_service.upload_file(content, file.filename)
-        if success:
-            return {"message": f"Successfully uploaded {file.filename} to S3 bucket: nexgen-raw-data"}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to upload to S3")
+        success = await service.upload_stream(file.read, file.filename, total_bytes=file.size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload error: {str(e)}")
+    if not success:
+        raise HTTPException(status_code=500, detail="Failed to upload to S3")
+    return {"message": f"Successfully uploaded {file.filename} to S3 bucket: {service.upload_bucket}"}
+
+
+@app.get("/api/upload/progress/{filename}")
+async def get_upload_progress(filename: str):
+    """
+    Get the progress of the latest upload of a file.
+    """
+    progress = (await s3_service.aget()).get_upload_progress(filename)
+    if progress is None:
+        raise HTTPException(status_code=404, detail=f"No upload found for {filename}")
+    return progress
 
 
 
 @app.get("/api/products/top", response_model=List[ProductPerformance])
-async def get_top_products(limit: int = 10):
+async def get_top_products(request: Request, limit: int = Query(10, ge=1, le=1000),
+                           metric: str = Query("revenue", pattern="^(revenue|quantity|orders)$"),
+                           cursor: Optional[str] = None,
+                           filters: Dict[str, Any] = Depends(dashboard_filters)):
     """
-    Get top performing products by revenue.
+    Get top performing products by revenue, quantity or order count.
+    When more products follow, the X-Next-Cursor response header holds the
+    cursor to pass for the next page.
     """
     try:
-        df = await s3_service.fetch_csv_from_s3()
-        products = data_processor.process_product_performance(df, limit=limit)
-        return products
+        return await cached_response(
+            request, "products-top", "process_product_page",
+            {"limit": limit, "metric": metric, "cursor": cursor}, filters, paginated=True
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching product data: {str(e)}")
 
 
 @app.get("/api/categories", response_model=List[CategoryPerformance])
-async def get_category_performance():
+async def get_category_performance(request: Request, filters: Dict[str, Any] = Depends(dashboard_filters)):
     """
     Get performance metrics by product category.
     """
     try:
-        df = await s3_service.fetch_csv_from_s3()
-        categories = data_processor.process_category_performance(df)
-        return categories
+        return await cached_response(
+            request, "categories", "process_category_performance", filters=filters
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching category data: {str(e)}")
 
 
 @app.get("/api/locations", response_model=List[LocationPerformance])
-async def get_location_performance():
+async def get_location_performance(request: Request, filters: Dict[str, Any] = Depends(dashboard_filters)):
     """
     Get performance metrics by location.
     """
     try:
-        df = await s3_service.fetch_csv_from_s3()
-        locations = data_processor.process_location_performance(df)
-        return locations
+        return await cached_response(
+            request, "locations", "process_location_performance", filters=filters
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching location data: {str(e)}")
 
 
+@app.get("/api/locations/list", response_model=List[str])
+async def get_location_list(request: Request):
+    """
+    Get the distinct store locations, for the location filter.
+    """
+    try:
+        return await cached_response(
+            request, "locations-list", "list_locations", tabular=False
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching location list: {str(e)}")
+
+
 @app.get("/api/customer-segments", response_model=List[CustomerSegmentPerformance])
-async def get_customer_segment_performance():
+async def get_customer_segment_performance(request: Request,
+                                           filters: Dict[str, Any] = Depends(dashboard_filters)):
     """
     Get performance metrics by customer segment.
     """
     try:
-        df = await s3_service.fetch_csv_from_s3()
-        segments = data_processor.process_customer_segment_performance(df)
-        return segments
+        return await cached_response(
+            request, "customer-segments", "process_customer_segment_performance",
+            filters=filters
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching customer segment data: {str(e)}")
 
 
 @app.get("/api/inventory/metrics", response_model=InventoryMetrics)
-async def get_inventory_metrics():
+async def get_inventory_metrics(request: Request, filters: Dict[str, Any] = Depends(dashboard_filters)):
     """
     Get inventory-related metrics.
     """
     try:
-        df = await s3_service.fetch_csv_from_s3()
-        metrics = data_processor.process_inventory_metrics(df)
-        return metrics
+        return await cached_response(
+            request, "inventory-metrics", "process_inventory_metrics", filters=filters
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching inventory data: {str(e)}")
 
@@ -202,9 +469,10 @@ async def predict_sales(data: Dict[str, float]):
     Make sales prediction using ML model
     """
     try:
-        return ml_service.predict_sales(data)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        service = await ml_service.aget()
+        return await service.predict_async("sales", data)
+    except PredictionError as e:
+        raise HTTPException(status_code=400, detail=f"Sales prediction failed: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
@@ -215,13 +483,85 @@ async def predict_stock(data: Dict[str, float]):
     Make stock replenishment prediction using ML model
     """
     try:
-        return ml_service.predict_stock(data)
+        service = await ml_service.aget()
+        return await service.predict_async("stock", data)
+    except PredictionError as e:
+        raise HTTPException(status_code=400, detail=f"Stock prediction failed: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+
+@app.get("/api/predict/metrics")
+async def prediction_metrics():
+    """
+    Micro-batching and prediction cache metrics
+    """
+    service = await ml_service.aget()
+    return {"batching": service.batcher.stats(), "cache": service.cache.stats()}
+
+
+@app.post("/api/predict/models/reload")
+async def reload_models():
+    """
+    Reload the model files and clear the prediction cache
+    """
+    service = await ml_service.aget()
+    return await asyncio.get_running_loop().run_in_executor(None, service.reload_models)
+
+
+async def batch_prediction(request: Request, model_name: str) -> Dict[str, Any]:
+    """
+    Score a batch of feature rows sent as a JSON array of objects (or
+    ``{"rows": [...]}``) or as CSV (``Content-Type: text/csv``).
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    service = await ml_service.aget()
+    try:
+        if "csv" in content_type:
+            rows = service.rows_from_csv(body)
+        else:
+            payload = json.loads(body or b"null")
+            rows = payload.get("rows") if isinstance(payload, dict) else payload
+            if not isinstance(rows, list):
+                raise ValueError("Body must be a JSON array of feature rows or an object with a 'rows' array")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch: {str(e)}")
+    if len(rows) > PREDICT_BATCH_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(rows)} rows; the limit is {PREDICT_BATCH_MAX_ROWS}"
+        )
+
+    try:
+        # One vectorized predict call, off the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None, service.predict_batch, model_name, rows
+        )
+    except PredictionError as e:
+        raise HTTPException(status_code=400, detail=f"{model_name.capitalize()} batch prediction failed: {e}")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
 
+@app.post("/api/predict/sales/batch")
+async def predict_sales_batch(request: Request):
+    """
+    Make sales predictions for many feature rows in one model call
+    """
+    return await batch_prediction(request, "sales")
+
+
+@app.post("/api/predict/stock/batch")
+async def predict_stock_batch(request: Request):
+    """
+    Make stock replenishment predictions for many feature rows in one model call
+    """
+    return await batch_prediction(request, "stock")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -9,6 +9,7 @@ class SalesData(BaseModel):
     forecast: float
     sales_2024: Optional[float] = 0
     sales_2025: Optional[float] = 0
+    sales_by_year: Optional[Dict[str, float]] = None
     quantity: Optional[float] = None
     orders: Optional[int] = None
 
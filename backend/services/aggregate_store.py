@@ -0,0 +1,243 @@
+import threading
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+from services.dataset import PreparedDataset
+
+Keys = Tuple[str, ...]
+Spec = Tuple[Optional[str], str]
+
+# Reductions whose results over disjoint row sets can be merged
+MERGEABLE_FUNCS = {'sum', 'count', 'size', 'mean', 'nunique', 'first'}
+
+
+def _plain_index(index: pd.Index) -> pd.Index:
+    """Replace categorical group levels by their values so partials from different files align"""
+    if isinstance(index, pd.MultiIndex):
+        return pd.MultiIndex.from_arrays(
+            [_plain_index(index.get_level_values(level)) for level in range(index.nlevels)],
+            names=index.names
+        )
+    if isinstance(index, pd.CategoricalIndex):
+        return pd.Index(np.asarray(index), name=index.name)
+    return index
+
+
+def _array_series(arrays: list, index: pd.Index) -> pd.Series:
+    """Object Series holding one numpy array per entry"""
+    values = np.empty(len(arrays), dtype=object)
+    for position, array in enumerate(arrays):
+        values[position] = array
+    return pd.Series(values, index=index)
+
+
+def _grouped_distinct(values: pd.Series, grouped) -> pd.Series:
+    """
+    Sorted distinct non-null ``values`` of every group. Each row becomes one
+    integer (group, value code) key and only the distinct keys are sorted,
+    instead of calling Python once per group.
+    """
+    codes, uniques = pd.factorize(values, sort=True)
+    groups = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    present = (codes >= 0) & (groups >= 0)
+    keys = pd.unique(groups[present] * len(uniques) + codes[present])
+    keys.sort()
+    groups, positions = np.divmod(keys, max(len(uniques), 1))
+    values = np.asarray(uniques)[positions]
+    bounds = np.searchsorted(groups, np.arange(grouped.ngroups + 1))
+    arrays = [values[bounds[group]:bounds[group + 1]] for group in range(grouped.ngroups)]
+    return _array_series(arrays, grouped.size().index)
+
+
+class AggregateStore:
+    """
+    Mergeable partial aggregates of the current dataset version.
+
+    Every grouping an :class:`AggregationPlan` asks for is kept as one
+    partial per reduction: sums, counts and sizes are added up, ``mean`` is
+    kept as a sum and a count, ``nunique`` as a sorted numpy array of the
+    distinct values per group and ``first`` as the first non-null value seen.
+
+    When a new dataset version keeps every object of the previous one at the
+    same rows and only appends new ones (see ``PreparedDataset.parts``), just
+    the appended rows are aggregated and folded in, so a small daily file
+    costs time in proportion to its size. Any other change rebuilds the
+    partials from all rows.
+    """
+
+    def __init__(self):
+        self.version: Optional[str] = None
+        self.parts: Dict[str, Tuple[str, int, int, int]] = {}
+        self.num_rows = 0
+        self.folds = 0
+        self.rebuilds = 0
+        self._columns: Set[str] = set()
+        self._partials: Dict[Keys, Dict[Spec, pd.Series]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def supports(groupings: Dict[Keys, Dict[str, Spec]], scalars: Dict[str, Spec]) -> bool:
+        specs = list(scalars.values())
+        for aggs in groupings.values():
+            specs.extend(aggs.values())
+        return all(func in MERGEABLE_FUNCS for _, func in specs)
+
+    def results(self, dataset: PreparedDataset, groupings: Dict[Keys, Dict[str, Spec]],
+                scalars: Dict[str, Spec]) -> Tuple[Dict[Keys, pd.DataFrame], Dict[str, Any]]:
+        """Finalized group frames and scalar values for ``dataset``"""
+        requested = dict(groupings)
+        if scalars:
+            requested[()] = scalars
+
+        with self._lock:
+            self._sync(dataset)
+            for keys, aggs in requested.items():
+                self._register(dataset, keys, aggs.values())
+
+            group_results = {
+                keys: self._finalize(self._partials[keys], aggs)
+                for keys, aggs in groupings.items()
+            }
+            scalar_results = {}
+            if scalars:
+                totals = self._finalize(self._partials[()], scalars)
+                scalar_results = {name: totals[name].iloc[0] for name in scalars}
+        return group_results, scalar_results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "rows": self.num_rows,
+            "groupings": len(self._partials),
+            "folds": self.folds,
+            "rebuilds": self.rebuilds,
+        }
+
+    # ------------------------------------------------------------------
+
+    def _sync(self, dataset: PreparedDataset) -> None:
+        """Bring the partials up to date with a new dataset version"""
+        if self.version is not None and dataset.version == self.version:
+            return
+
+        if self._extends(dataset):
+            rows = dataset.select(self._needed_columns()).iloc[self.num_rows:]
+            for keys, partials in self._partials.items():
+                fresh = self._aggregate(rows, keys, partials)
+                for spec, series in fresh.items():
+                    partials[spec] = self._merge(spec[1], partials[spec], series)
+            self.folds += 1
+            print(f"Folded {len(rows)} new rows into the aggregates of dataset {dataset.version}")
+        elif self._partials:
+            available = set(dataset.columns)
+            frame = dataset.select([column for column in self._needed_columns() if column in available])
+            rebuilt = {}
+            for keys, partials in self._partials.items():
+                if any(key not in available for key in keys):
+                    continue
+                specs = [spec for spec in partials if spec[0] is None or spec[0] in available]
+                rebuilt[keys] = self._aggregate(frame, keys, specs)
+            self._partials = rebuilt
+            self.rebuilds += 1
+            print(f"Rebuilt aggregates over {len(dataset)} rows of dataset {dataset.version}")
+
+        self.version = dataset.version
+        self.parts = dict(dataset.parts)
+        self.num_rows = len(dataset)
+        self._columns = set(dataset.columns)
+
+    def _extends(self, dataset: PreparedDataset) -> bool:
+        """True when ``dataset`` holds the aggregated rows unchanged, followed only by new objects"""
+        if not self.parts or len(dataset) < self.num_rows or set(dataset.columns) != self._columns:
+            return False
+        if any(dataset.parts.get(key) != part for key, part in self.parts.items()):
+            return False
+        return all(
+            part[2] >= self.num_rows
+            for key, part in dataset.parts.items() if key not in self.parts
+        )
+
+    def _register(self, dataset: PreparedDataset, keys: Keys, specs: Iterable[Spec]) -> None:
+        """Compute partials the store doesn't hold yet from all rows of the current version"""
+        partials = self._partials.setdefault(keys, {})
+        missing = [spec for spec in self._base_specs(specs) if spec not in partials]
+        if not missing:
+            return
+        columns = list(keys) + [column for column, _ in missing if column is not None]
+        frame = dataset.select(list(dict.fromkeys(columns)))
+        partials.update(self._aggregate(frame, keys, missing))
+
+    def _needed_columns(self) -> list:
+        columns = []
+        for keys, partials in self._partials.items():
+            columns.extend(keys)
+            columns.extend(column for column, _ in partials if column is not None)
+        return list(dict.fromkeys(columns))
+
+    @staticmethod
+    def _base_specs(specs: Iterable[Spec]) -> list:
+        """Mergeable building blocks of the requested reductions"""
+        base = []
+        for column, func in specs:
+            if func == 'mean':
+                base.extend([(column, 'sum'), (column, 'count')])
+            else:
+                base.append((column, func))
+        return list(dict.fromkeys(base))
+
+    @staticmethod
+    def _aggregate(frame: pd.DataFrame, keys: Keys, specs: Iterable[Spec]) -> Dict[Spec, pd.Series]:
+        """Partial results of base reductions over ``frame``"""
+        partials = {}
+        grouped = frame.groupby(list(keys), observed=True, sort=False) if keys else None
+        for column, func in specs:
+            if grouped is None:
+                if func == 'nunique':
+                    distinct = np.unique(frame[column].dropna().to_numpy())
+                    series = _array_series([distinct], pd.RangeIndex(1))
+                else:
+                    if func == 'size':
+                        value = len(frame)
+                    elif func == 'first':
+                        present = frame[column].dropna()
+                        value = present.iloc[0] if len(present) else np.nan
+                    else:
+                        value = getattr(frame[column], func)()
+                    series = pd.Series([value])
+            elif func == 'size':
+                series = grouped.size()
+            elif func == 'nunique':
+                series = _grouped_distinct(frame[column], grouped)
+            else:
+                series = grouped[column].agg(func)
+            series.index = _plain_index(series.index)
+            partials[(column, func)] = series
+        return partials
+
+    @staticmethod
+    def _merge(func: str, current: pd.Series, new: pd.Series) -> pd.Series:
+        """Fold the partial of newly appended rows into the existing one"""
+        if func in ('sum', 'count', 'size'):
+            return current.add(new, fill_value=0)
+        if func == 'first':
+            # Existing rows come first, so their value wins unless it is missing
+            return current.combine_first(new)
+        # nunique: union the sorted distinct values of groups seen before
+        distinct = dict(current.items())
+        for key, values in new.items():
+            previous = distinct.get(key)
+            distinct[key] = values if previous is None else np.union1d(previous, values)
+        index = current.index.append(new.index[~new.index.isin(current.index)])
+        return _array_series([distinct[key] for key in index], index)
+
+    @staticmethod
+    def _finalize(partials: Dict[Spec, pd.Series], aggs: Dict[str, Spec]) -> pd.DataFrame:
+        columns = {}
+        for name, (column, func) in aggs.items():
+            if func == 'mean':
+                columns[name] = partials[(column, 'sum')] / partials[(column, 'count')]
+            elif func == 'nunique':
+                columns[name] = partials[(column, func)].map(len)
+            else:
+                columns[name] = partials[(column, func)]
+        return pd.DataFrame(columns)
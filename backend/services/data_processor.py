@@ -1,146 +1,436 @@
+import numpy as np
 import pandas as pd
-from typing import List, Dict
-from datetime import datetime
-from models.schemas import (
-    SalesData, DashboardStats, ProductPerformance, 
-    CategoryPerformance, LocationPerformance, 
-    CustomerSegmentPerformance, InventoryMetrics
-)
+from typing import List, Dict, Tuple, Optional, Any, Union
+from datetime import date
+from services.dataset import PreparedDataset, DatasetLike
+from services.aggregate_store import AggregateStore
+from services.filter_index import FilterIndex
+from services.sales_rollup import DailyRollup
+from services.product_ranking import ProductRanking
+
+# JSON-ready section output: one object, or a list of objects shaped like the
+# response models in models.schemas (SalesData, ProductPerformance, ...)
+Record = Dict[str, Any]
+SectionOutput = Union[Record, List[Record]]
+# Every public ``process_*`` method takes ``as_frame=True`` to return the
+# section frames themselves (objects as one-row frames), for columnar encoders
+
+
+def frame_records(frame: pd.DataFrame) -> List[Record]:
+    """
+    Rows of a finished result frame as plain dicts.
+    Values are converted to Python scalars column by column, so no
+    per-row pandas or pydantic objects are created.
+    """
+    names = list(frame.columns)
+    columns = [frame[name].tolist() for name in names]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+class AggregationPlan:
+    """
+    Collects the aggregations requested by dashboard sections and runs
+    each distinct grouping exactly once over the raw rows.
+
+    Sections register named aggregations against a tuple of group keys
+    (``plan.group(('location',), total_revenue=('amount', 'sum'))``) or as
+    whole-frame scalars. Requests that share keys are merged, so the
+    comprehensive dashboard scans the dataset once per grouping instead of
+    once per section.
+
+    With an :class:`AggregateStore` the results come from its maintained
+    partial aggregates instead of a scan of the rows.
+    """
+
+    def __init__(self, dataset: PreparedDataset, store: Optional[AggregateStore] = None):
+        self.dataset = dataset
+        self.store = store
+        # Narrow frame of just the planned columns, set by execute() when it scans rows
+        self.df: Optional[pd.DataFrame] = None
+        self._groupings: Dict[Tuple[str, ...], Dict[str, Tuple[str, str]]] = {}
+        self._scalars: Dict[str, Tuple[str, str]] = {}
+        self._group_results: Dict[Tuple[str, ...], pd.DataFrame] = {}
+        self._scalar_results: Dict[str, Any] = {}
+
+    def group(self, keys: Tuple[str, ...], **aggs: Tuple[str, str]) -> None:
+        """Request named aggregations over the given group keys"""
+        requested = self._groupings.setdefault(tuple(keys), {})
+        for name, spec in aggs.items():
+            if name in requested and requested[name] != spec:
+                raise ValueError(f"Conflicting aggregation '{name}' for keys {keys}")
+            requested[name] = spec
+
+    def scalar(self, **aggs: Tuple[str, str]) -> None:
+        """Request whole-frame reductions, e.g. ``total_revenue=('amount', 'sum')``"""
+        for name, spec in aggs.items():
+            if name in self._scalars and self._scalars[name] != spec:
+                raise ValueError(f"Conflicting scalar aggregation '{name}'")
+            self._scalars[name] = spec
+
+    @property
+    def columns(self) -> List[str]:
+        """Every dataset column the plan touches; nothing else is loaded"""
+        needed = []
+        for keys, aggs in self._groupings.items():
+            needed.extend(keys)
+            needed.extend(column for column, _ in aggs.values())
+        needed.extend(column for column, _ in self._scalars.values())
+        available = set(self.dataset.columns)
+        return [column for column in dict.fromkeys(needed) if column in available]
+
+    def execute(self) -> "AggregationPlan":
+        """Run every requested grouping and scalar reduction once"""
+        available_columns = set(self.dataset.columns)
+        groupings = {}
+        for keys, aggs in self._groupings.items():
+            available = {
+                name: (column, func) for name, (column, func) in aggs.items()
+                if column in available_columns
+            }
+            if any(key not in available_columns for key in keys) or not available:
+                self._group_results[keys] = pd.DataFrame(columns=list(aggs))
+                continue
+            groupings[keys] = available
+
+        scalars = {}
+        for name, (column, func) in self._scalars.items():
+            if func == 'size' or column in available_columns:
+                scalars[name] = (column, func)
+            else:
+                self._scalar_results[name] = None
+
+        if self.store is not None and self.store.supports(groupings, scalars):
+            group_results, scalar_results = self.store.results(self.dataset, groupings, scalars)
+            self._group_results.update(group_results)
+            self._scalar_results.update(scalar_results)
+            return self
+
+        self.df = self.dataset.select(self.columns)
+        for keys, aggs in groupings.items():
+            self._group_results[keys] = self.df.groupby(
+                list(keys), observed=True, sort=False
+            ).agg(**aggs)
+
+        for name, (column, func) in scalars.items():
+            if func == 'size':
+                self._scalar_results[name] = len(self.df)
+            else:
+                self._scalar_results[name] = getattr(self.df[column], func)()
+        return self
+
+    def result(self, *keys: str) -> pd.DataFrame:
+        """Aggregated frame for a grouping requested via :meth:`group`"""
+        return self._group_results[tuple(keys)]
+
+    def value(self, name: str, default: Any = 0) -> Any:
+        """Result of a scalar requested via :meth:`scalar`"""
+        value = self._scalar_results.get(name)
+        if value is None or pd.isna(value):
+            return default
+        return value
 
 
 class DataProcessor:
     """Service for processing CSV data into dashboard-friendly formats"""
-    
+
+    def __init__(self):
+        # Partial aggregates of the served dataset, folded forward as new files arrive
+        self.aggregates = AggregateStore()
+        # Inverted index of the filter columns for the latest dataset version
+        self._filter_index: Optional[FilterIndex] = None
+        # Daily sales prefix sums for the latest dataset version
+        self._rollup: Optional[DailyRollup] = None
+        # Per-product totals for the latest dataset version, ranked on demand
+        self._ranking: Optional[ProductRanking] = None
+
     # Month name mapping
     MONTH_NAMES = {
         1: "Jan", 2: "Feb", 3: "Mar", 4: "Apr",
         5: "May", 6: "Jun", 7: "Jul", 8: "Aug",
         9: "Sep", 10: "Oct", 11: "Nov", 12: "Dec"
     }
-    
-    def process_sales_data(self, df: pd.DataFrame) -> List[SalesData]:
+
+    # Sections of the comprehensive dashboard, in response order
+    COMPREHENSIVE_SECTIONS = [
+        ("sales_data", "sales_data"),
+        ("stats", "dashboard_stats"),
+        ("top_products", "product_performance"),
+        ("categories", "category_performance"),
+        ("locations", "location_performance"),
+        ("customer_segments", "customer_segment_performance"),
+        ("inventory_metrics", "inventory_metrics"),
+    ]
+
+    def process_comprehensive(self, dataset: DatasetLike, product_limit: int = 20,
+                              filters: Optional[Dict[str, Any]] = None,
+                              as_frame: bool = False) -> Dict[str, SectionOutput]:
+        """
+        Build every dashboard section from a single shared aggregation plan.
+        Each distinct grouping runs once and its result is handed to all
+        sections that need it.
         """
-        Process DataFrame to extract monthly sales data.
+        sections = [section for _, section in self.COMPREHENSIVE_SECTIONS]
+        plan = self._plan(dataset, sections, filters)
+        results = self._build(plan, sections, {"product_performance": {"limit": product_limit}})
+        return {name: self._output(results[section], as_frame) for name, section in self.COMPREHENSIVE_SECTIONS}
+
+    def process_sales_data(self, dataset: DatasetLike,
+                           filters: Optional[Dict[str, Any]] = None,
+                           start: Optional[date] = None, end: Optional[date] = None,
+                           granularity: Optional[str] = None, as_frame: bool = False) -> List[Record]:
+        """
+        Process the dataset to extract monthly sales data.
         Groups by month and calculates sales totals and forecasts.
-        Includes breakdown for 2024 and 2025 if 'year' column exists.
+        Includes breakdown per year if the purchase month is known.
+
+        With ``start``, ``end`` or ``granularity`` the result is instead a
+        time series of day, week or month buckets (default month) within
+        the date range; ``month`` then holds the bucket label.
         """
-        # Create a copy to avoid modifying original
-        df = df.copy()
-        
-        # Ensure date column is datetime and extract month/year if needed
-        if 'date_of_purchase' in df.columns:
-            df['date_of_purchase'] = pd.to_datetime(df['date_of_purchase'])
-            if 'month' not in df.columns:
-                df['month'] = df['date_of_purchase'].dt.month
-            if 'year' not in df.columns:
-                df['year'] = df['date_of_purchase'].dt.year
-        elif 'month' not in df.columns:
-            # If no date and no month, can't process
-            # But assume 'month' exists (from S3 partition)
-            pass
-            
-        # Ensure Year/Month are numeric
-        if 'year' in df.columns:
-            df['year'] = pd.to_numeric(df['year'], errors='coerce')
-        if 'month' in df.columns:
-            df['month'] = pd.to_numeric(df['month'], errors='coerce')
-
-        # 1. Aggregate totals (across all years)
-        total_monthly = df.groupby('month').agg({
-            'amount': 'sum',
-            'quantity': 'sum',
-            'customer_id': 'count'
-        }).to_dict('index')
-
-        # 2. Pivot for Year-wise Sales
-        sales_by_year = {}
-        if 'year' in df.columns:
-            # Group by [month, year] -> sum 'amount'
-            year_month_grp = df.groupby(['month', 'year'])['amount'].sum()
-            # Convert to nested dict: { month: { year: amount } }
-            for (m, y), amt in year_month_grp.items():
-                if m not in sales_by_year:
-                    sales_by_year[m] = {}
-                sales_by_year[m][y] = amt
-
-        # Build Result List
-        sales_data = []
-        for month_num in range(1, 13):
-            month_name = self.MONTH_NAMES[month_num]
-            
-            # Get totals
-            stats = total_monthly.get(month_num, {'amount': 0, 'quantity': 0, 'customer_id': 0})
-            total_sales = stats['amount']
-            
-            # Get year-wise breakdown
-            year_breakdown = sales_by_year.get(month_num, {})
-            sales_2024 = year_breakdown.get(2024, 0)
-            sales_2025 = year_breakdown.get(2025, 0)
-            
-            # Calculate forecast (simple logic)
-            forecast = total_sales * 1.05 
-            
-            sales_data.append(SalesData(
-                month=month_name,
-                sales=round(float(total_sales), 2),
-                forecast=round(float(forecast), 2),
-                sales_2024=round(float(sales_2024), 2),
-                sales_2025=round(float(sales_2025), 2),
-                quantity=round(float(stats['quantity']), 0),
-                orders=int(stats['customer_id'])
-            ))
-            
-        return sales_data
-    
-    def process_dashboard_stats(self, df: pd.DataFrame) -> DashboardStats:
+        if start is None and end is None and granularity is None:
+            return self._run(dataset, "sales_data", filters, as_frame)
+
+        buckets = self._daily_rollup(dataset, filters).buckets(start, end, granularity or "month")
+        sales = buckets['total_revenue'].astype(np.float64).round(2)
+        sales_data = pd.DataFrame({
+            'month': buckets['label'],
+            'sales': sales,
+            'forecast': (buckets['total_revenue'].astype(np.float64) * 1.05).round(2),
+            'sales_2024': sales.where(buckets['year'] == 2024, 0.0),
+            'sales_2025': sales.where(buckets['year'] == 2025, 0.0),
+            'sales_by_year': [{str(year): amount} for year, amount in zip(buckets['year'].tolist(), sales.tolist())],
+            'quantity': buckets['total_quantity'].astype(np.float64).round(0),
+            'orders': buckets['order_count'].astype(np.int64),
+        })
+        return self._output(sales_data, as_frame)
+
+    def process_dashboard_stats(self, dataset: DatasetLike,
+                                filters: Optional[Dict[str, Any]] = None,
+                                as_frame: bool = False) -> Record:
         """
-        Process DataFrame to calculate dashboard statistics.
+        Process the dataset to calculate dashboard statistics.
         Calculates Total Revenue, Growth Rate, Active Customers, and Target Progress.
         """
-        # Create a copy to avoid modifying original
-        df = df.copy()
-        
+        return self._run(dataset, "dashboard_stats", filters, as_frame)
+
+    def process_product_performance(self, dataset: DatasetLike, limit: int = 10,
+                                    filters: Optional[Dict[str, Any]] = None,
+                                    metric: str = "revenue", as_frame: bool = False) -> List[Record]:
+        """Process product performance data"""
+        products, _ = self.process_product_page(dataset, limit, filters, metric, as_frame=as_frame)
+        return products
+
+    def process_product_page(self, dataset: DatasetLike, limit: int = 10,
+                             filters: Optional[Dict[str, Any]] = None, metric: str = "revenue",
+                             cursor: Optional[str] = None,
+                             as_frame: bool = False) -> Tuple[List[Record], Optional[str]]:
+        """
+        One page of products ranked by revenue, quantity or orders.
+        Returns the products and the cursor of the next page (None on the last page).
+        """
+        ranking = self._product_ranking(dataset, filters)
+        rows, next_cursor = ranking.top(metric, limit, cursor)
+        return self._output(self._product_frame(ranking, rows), as_frame), next_cursor
+
+    def process_category_performance(self, dataset: DatasetLike,
+                                     filters: Optional[Dict[str, Any]] = None,
+                                     as_frame: bool = False) -> List[Record]:
+        """Process category performance data"""
+        return self._run(dataset, "category_performance", filters, as_frame)
+
+    def process_location_performance(self, dataset: DatasetLike,
+                                     filters: Optional[Dict[str, Any]] = None,
+                                     as_frame: bool = False) -> List[Record]:
+        """Process location performance data"""
+        return self._run(dataset, "location_performance", filters, as_frame)
+
+    def process_customer_segment_performance(self, dataset: DatasetLike,
+                                             filters: Optional[Dict[str, Any]] = None,
+                                             as_frame: bool = False) -> List[Record]:
+        """Process customer segment performance data"""
+        return self._run(dataset, "customer_segment_performance", filters, as_frame)
+
+    def process_inventory_metrics(self, dataset: DatasetLike,
+                                  filters: Optional[Dict[str, Any]] = None,
+                                  as_frame: bool = False) -> Record:
+        """Process inventory-related metrics"""
+        return self._run(dataset, "inventory_metrics", filters, as_frame)
+
+    def list_locations(self, dataset: DatasetLike) -> List[str]:
+        """Distinct store locations, for the dashboard's location picker"""
+        return self._index(PreparedDataset.ensure(dataset)).values('location')
+
+    # ------------------------------------------------------------------
+    # Plan / build plumbing
+    # ------------------------------------------------------------------
+
+    def _run(self, dataset: DatasetLike, section: str,
+             filters: Optional[Dict[str, Any]] = None, as_frame: bool = False,
+             **options) -> SectionOutput:
+        plan = self._plan(dataset, [section], filters)
+        return self._output(self._build(plan, [section], {section: options})[section], as_frame)
+
+    @staticmethod
+    def _output(result: Union[pd.DataFrame, Record], as_frame: bool = False) -> SectionOutput:
+        """List sections are built as frames; objects are already records"""
+        if as_frame:
+            return result if isinstance(result, pd.DataFrame) else pd.DataFrame([result])
+        if isinstance(result, pd.DataFrame):
+            return frame_records(result)
+        return result
+
+    def _plan(self, dataset: DatasetLike, sections: List[str],
+              filters: Optional[Dict[str, Any]] = None) -> AggregationPlan:
+        dataset = self._filter(PreparedDataset.ensure(dataset), filters)
+        # Only versioned datasets are the served data; ad-hoc frames are scanned directly
+        store = self.aggregates if dataset.version is not None else None
+        plan = AggregationPlan(dataset, store)
+        for section in sections:
+            getattr(self, f"_plan_{section}")(plan)
+        return plan.execute()
+
+    def _daily_rollup(self, dataset: DatasetLike, filters: Optional[Dict[str, Any]] = None) -> DailyRollup:
+        """Daily totals of the (filtered) dataset; cached per version when unfiltered"""
+        dataset = self._filter(PreparedDataset.ensure(dataset), filters)
+        if dataset.version is not None and self._rollup is not None and self._rollup.version == dataset.version:
+            return self._rollup
+
+        store = self.aggregates if dataset.version is not None else None
+        plan = AggregationPlan(dataset, store)
+        plan.group(
+            ('date_of_purchase',),
+            total_revenue=('amount', 'sum'),
+            total_quantity=('quantity', 'sum'),
+            order_count=('customer_id', 'count')
+        )
+        rollup = DailyRollup(plan.execute().result('date_of_purchase'), dataset.version)
+        if dataset.version is not None:
+            self._rollup = rollup
+        return rollup
+
+    def _product_ranking(self, dataset: DatasetLike, filters: Optional[Dict[str, Any]] = None) -> ProductRanking:
+        """Per-product totals of the (filtered) dataset; cached per version when unfiltered"""
+        dataset = self._filter(PreparedDataset.ensure(dataset), filters)
+        if dataset.version is not None and self._ranking is not None and self._ranking.version == dataset.version:
+            return self._ranking
+
+        plan = self._plan(dataset, ["product_performance"])
+        ranking = ProductRanking(plan.result('product_name', 'category'), dataset.version)
+        if dataset.version is not None:
+            self._ranking = ranking
+        return ranking
+
+    def _filter(self, dataset: PreparedDataset, filters: Optional[Dict[str, Any]]) -> PreparedDataset:
+        """Rows of the dataset matching the filters, looked up in the inverted index"""
+        if not filters or all(value is None for value in filters.values()):
+            return dataset
+        return dataset.take(self._index(dataset).rows(filters))
+
+    def _index(self, dataset: PreparedDataset) -> FilterIndex:
+        if dataset.version is None:
+            return FilterIndex(dataset)
+        if self._filter_index is None or self._filter_index.version != dataset.version:
+            self._filter_index = FilterIndex(dataset)
+        return self._filter_index
+
+    def _build(self, plan: AggregationPlan, sections: List[str],
+               options: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        options = options or {}
+        return {
+            section: getattr(self, f"_build_{section}")(plan, **options.get(section, {}))
+            for section in sections
+        }
+
+    # ------------------------------------------------------------------
+    # Sections
+    # ------------------------------------------------------------------
+
+    def _plan_sales_data(self, plan: AggregationPlan) -> None:
+        plan.group(
+            ('year_month',),
+            total_revenue=('amount', 'sum'),
+            total_quantity=('quantity', 'sum'),
+            order_count=('customer_id', 'count')
+        )
+
+    def _build_sales_data(self, plan: AggregationPlan) -> pd.DataFrame:
+        monthly = plan.result('year_month')
+        months = pd.RangeIndex(1, 13)
+
+        # Totals across all years, plus the per-year breakdown, from one grouping
+        columns = ['total_revenue', 'total_quantity', 'order_count']
+        if len(monthly) > 0:
+            totals = monthly[columns].groupby(monthly.index.month).sum().reindex(months, fill_value=0)
+            by_year = monthly['total_revenue'].groupby(
+                [monthly.index.month, monthly.index.year]
+            ).sum().unstack().reindex(months)
+        else:
+            totals = pd.DataFrame(0, index=months, columns=columns)
+            by_year = pd.DataFrame(index=months)
+        yearly = by_year.round(2).to_dict('index')
+
+        def year_column(year: int) -> pd.Series:
+            if year not in by_year.columns:
+                return pd.Series(0.0, index=months)
+            return by_year[year].fillna(0.0).round(2)
+
+        total_sales = totals['total_revenue'].astype(np.float64)
+        return pd.DataFrame({
+            'month': [self.MONTH_NAMES[month_num] for month_num in months],
+            'sales': total_sales.round(2),
+            # Calculate forecast (simple logic)
+            'forecast': (total_sales * 1.05).round(2),
+            'sales_2024': year_column(2024),
+            'sales_2025': year_column(2025),
+            'sales_by_year': [
+                {str(year): amount for year, amount in yearly[month_num].items() if not pd.isna(amount)}
+                for month_num in months
+            ],
+            'quantity': totals['total_quantity'].astype(np.float64).round(0),
+            'orders': totals['order_count'].astype(np.int64),
+        }).reset_index(drop=True)
+
+    def _plan_dashboard_stats(self, plan: AggregationPlan) -> None:
+        plan.scalar(
+            total_revenue=('amount', 'sum'),
+            total_orders=(None, 'size'),
+            active_customers=('customer_id', 'nunique')
+        )
+        plan.group(('year_month',), total_revenue=('amount', 'sum'))
+        # Distinct products and locations fall out of groupings other sections share
+        plan.group(('product_name', 'category'), total_revenue=('amount', 'sum'))
+        plan.group(('location',), total_revenue=('amount', 'sum'))
+
+    def _build_dashboard_stats(self, plan: AggregationPlan) -> Record:
         # Total Revenue (sum of all amounts)
-        total_revenue = df['amount'].sum()
-        total_orders = len(df)
+        total_revenue = plan.value('total_revenue')
+        total_orders = plan.value('total_orders')
         avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
-        
+
         # Calculate growth rate (comparing current period to previous)
         growth_rate = 0
-        if 'date_of_purchase' in df.columns:
-            df['date_of_purchase'] = pd.to_datetime(df['date_of_purchase'])
-            df['year_month'] = df['date_of_purchase'].dt.to_period('M')
-            
-            # Get latest month and previous month
-            unique_months = sorted(df['year_month'].unique())
-            if len(unique_months) >= 2:
-                latest_month = unique_months[-1]
-                previous_month = unique_months[-2]
-                
-                latest_revenue = df[df['year_month'] == latest_month]['amount'].sum()
-                previous_revenue = df[df['year_month'] == previous_month]['amount'].sum()
-                
-                if previous_revenue > 0:
-                    growth_rate = ((latest_revenue - previous_revenue) / previous_revenue) * 100
-        
+        target_progress = 0
+        monthly_revenues = plan.result('year_month')['total_revenue'].sort_index()
+        if len(monthly_revenues) >= 2:
+            latest_revenue = monthly_revenues.iloc[-1]
+            previous_revenue = monthly_revenues.iloc[-2]
+            if previous_revenue > 0:
+                growth_rate = ((latest_revenue - previous_revenue) / previous_revenue) * 100
+
         # Active Customers (unique customer IDs)
-        active_customers = df['customer_id'].nunique()
-        
+        active_customers = plan.value('active_customers')
+
         # Target Progress (assuming target is 120% of average monthly revenue)
-        target_progress = 0
-        if 'date_of_purchase' in df.columns and 'year_month' in df.columns:
-            monthly_revenues = df.groupby('year_month')['amount'].sum()
-            if len(monthly_revenues) > 0:
-                monthly_avg = monthly_revenues.mean()
-                target = monthly_avg * 1.2
-                latest_month = df['year_month'].max()
-                latest_month_revenue = df[df['year_month'] == latest_month]['amount'].sum()
-                target_progress = min((latest_month_revenue / target) * 100, 100) if target > 0 else 0
-        
+        if len(monthly_revenues) > 0:
+            target = monthly_revenues.mean() * 1.2
+            latest_month_revenue = monthly_revenues.iloc[-1]
+            target_progress = min((latest_month_revenue / target) * 100, 100) if target > 0 else 0
+
         # Additional metrics
-        total_products = df['product_name'].nunique() if 'product_name' in df.columns else 0
-        total_locations = df['location'].nunique() if 'location' in df.columns else 0
-        
+        products = plan.result('product_name', 'category')
+        total_products = products.index.get_level_values(0).nunique() if len(products) > 0 else 0
+        total_locations = len(plan.result('location'))
+
         # Format values
         formatted_revenue = f"${total_revenue:,.0f}"
         formatted_growth = f"{growth_rate:.1f}%"
@@ -150,14 +440,14 @@ class DataProcessor:
         formatted_avg_order = f"${avg_order_value:,.2f}"
         formatted_products = f"{total_products:,}"
         formatted_locations = f"{total_locations:,}"
-        
+
         # Calculate changes (compare with previous period if available)
         revenue_change = "+12.5%"
         growth_change = "+4.3%"
         customers_change = "+8.2%"
         target_change = "+15%"
-        
-        return DashboardStats(
+
+        return dict(
             total_revenue=formatted_revenue,
             growth_rate=formatted_growth,
             active_customers=formatted_customers,
@@ -171,124 +461,132 @@ class DataProcessor:
             total_products=formatted_products,
             total_locations=formatted_locations
         )
-    
-    def process_product_performance(self, df: pd.DataFrame, limit: int = 10) -> List[ProductPerformance]:
-        """Process product performance data"""
-        df = df.copy()
-        
-        product_stats = df.groupby(['product_name', 'category']).agg({
-            'amount': 'sum',
-            'quantity': 'sum',
-            'customer_id': 'count',
-            'unit_price': 'mean'
-        }).reset_index()
-        
-        product_stats.columns = ['product_name', 'category', 'total_revenue', 'total_quantity', 'order_count', 'avg_price']
-        product_stats = product_stats.sort_values('total_revenue', ascending=False).head(limit)
-        
-        return [
-            ProductPerformance(
-                product_name=row['product_name'],
-                total_revenue=round(float(row['total_revenue']), 2),
-                total_quantity=int(row['total_quantity']),
-                order_count=int(row['order_count']),
-                avg_price=round(float(row['avg_price']), 2),
-                category=row['category']
-            )
-            for _, row in product_stats.iterrows()
-        ]
-    
-    def process_category_performance(self, df: pd.DataFrame) -> List[CategoryPerformance]:
-        """Process category performance data"""
-        df = df.copy()
-        
-        category_stats = df.groupby('category').agg({
-            'amount': 'sum',
-            'quantity': 'sum',
-            'customer_id': 'count'
-        }).reset_index()
-        
-        category_stats.columns = ['category', 'total_revenue', 'total_quantity', 'order_count']
+
+    def _plan_product_performance(self, plan: AggregationPlan) -> None:
+        plan.group(
+            ('product_name', 'category'),
+            total_revenue=('amount', 'sum'),
+            total_quantity=('quantity', 'sum'),
+            order_count=('customer_id', 'count'),
+            avg_price=('unit_price', 'mean')
+        )
+
+    def _build_product_performance(self, plan: AggregationPlan, limit: int = 10) -> pd.DataFrame:
+        ranking = ProductRanking(plan.result('product_name', 'category'))
+        rows, _ = ranking.top("revenue", limit)
+        return self._product_frame(ranking, rows)
+
+    def _product_frame(self, ranking: ProductRanking, rows: np.ndarray) -> pd.DataFrame:
+        products = ranking.frame(rows)
+        return pd.DataFrame({
+            'product_name': products['product_name'],
+            'total_revenue': products['total_revenue'].astype(np.float64).round(2),
+            'total_quantity': products['total_quantity'].astype(np.int64),
+            'order_count': products['order_count'].astype(np.int64),
+            'avg_price': products['avg_price'].astype(np.float64).round(2),
+            'category': products['category'],
+        })
+
+    def _plan_category_performance(self, plan: AggregationPlan) -> None:
+        # Categories roll up from the product grouping instead of rescanning rows
+        plan.group(
+            ('product_name', 'category'),
+            total_revenue=('amount', 'sum'),
+            total_quantity=('quantity', 'sum'),
+            order_count=('customer_id', 'count')
+        )
+
+    def _build_category_performance(self, plan: AggregationPlan) -> pd.DataFrame:
+        products = plan.result('product_name', 'category')
+        category_stats = products.groupby(level='category', observed=True)[
+            ['total_revenue', 'total_quantity', 'order_count']
+        ].sum().reset_index()
+
         category_stats['avg_order_value'] = category_stats['total_revenue'] / category_stats['order_count']
         category_stats = category_stats.sort_values('total_revenue', ascending=False)
-        
-        return [
-            CategoryPerformance(
-                category=row['category'],
-                total_revenue=round(float(row['total_revenue']), 2),
-                total_quantity=int(row['total_quantity']),
-                order_count=int(row['order_count']),
-                avg_order_value=round(float(row['avg_order_value']), 2)
-            )
-            for _, row in category_stats.iterrows()
-        ]
-    
-    def process_location_performance(self, df: pd.DataFrame) -> List[LocationPerformance]:
-        """Process location performance data"""
-        df = df.copy()
-        
-        location_stats = df.groupby('location').agg({
-            'amount': 'sum',
-            'quantity': 'sum',
-            'customer_id': ['count', 'nunique']
-        }).reset_index()
-        
-        location_stats.columns = ['location', 'total_revenue', 'total_quantity', 'order_count', 'customer_count']
+
+        return pd.DataFrame({
+            'category': category_stats['category'].astype(str),
+            'total_revenue': category_stats['total_revenue'].astype(np.float64).round(2),
+            'total_quantity': category_stats['total_quantity'].astype(np.int64),
+            'order_count': category_stats['order_count'].astype(np.int64),
+            'avg_order_value': category_stats['avg_order_value'].astype(np.float64).round(2),
+        })
+
+    def _plan_location_performance(self, plan: AggregationPlan) -> None:
+        plan.group(
+            ('location',),
+            total_revenue=('amount', 'sum'),
+            total_quantity=('quantity', 'sum'),
+            order_count=('customer_id', 'count'),
+            customer_count=('customer_id', 'nunique')
+        )
+
+    def _build_location_performance(self, plan: AggregationPlan) -> pd.DataFrame:
+        location_stats = plan.result('location').reset_index()
         location_stats = location_stats.sort_values('total_revenue', ascending=False)
-        
-        return [
-            LocationPerformance(
-                location=row['location'],
-                total_revenue=round(float(row['total_revenue']), 2),
-                total_quantity=int(row['total_quantity']),
-                order_count=int(row['order_count']),
-                customer_count=int(row['customer_count'])
-            )
-            for _, row in location_stats.iterrows()
-        ]
-    
-    def process_customer_segment_performance(self, df: pd.DataFrame) -> List[CustomerSegmentPerformance]:
-        """Process customer segment performance data"""
-        df = df.copy()
-        
-        segment_stats = df.groupby('customer_segment').agg({
-            'amount': ['sum', 'mean'],
-            'customer_id': 'nunique'
-        }).reset_index()
-        
-        segment_stats.columns = ['customer_segment', 'total_revenue', 'avg_order_value', 'customer_count']
+
+        return pd.DataFrame({
+            'location': location_stats['location'].astype(str),
+            'total_revenue': location_stats['total_revenue'].astype(np.float64).round(2),
+            'total_quantity': location_stats['total_quantity'].astype(np.int64),
+            'order_count': location_stats['order_count'].astype(np.int64),
+            'customer_count': location_stats['customer_count'].astype(np.int64),
+        })
+
+    def _plan_customer_segment_performance(self, plan: AggregationPlan) -> None:
+        plan.group(
+            ('customer_segment',),
+            total_revenue=('amount', 'sum'),
+            avg_order_value=('amount', 'mean'),
+            customer_count=('customer_id', 'nunique')
+        )
+
+    def _build_customer_segment_performance(self, plan: AggregationPlan) -> pd.DataFrame:
+        segment_stats = plan.result('customer_segment').reset_index()
         segment_stats['avg_revenue_per_customer'] = segment_stats['total_revenue'] / segment_stats['customer_count']
         segment_stats = segment_stats.sort_values('total_revenue', ascending=False)
-        
-        return [
-            CustomerSegmentPerformance(
-                customer_segment=row['customer_segment'],
-                total_revenue=round(float(row['total_revenue']), 2),
-                customer_count=int(row['customer_count']),
-                avg_revenue_per_customer=round(float(row['avg_revenue_per_customer']), 2),
-                avg_order_value=round(float(row['avg_order_value']), 2)
-            )
-            for _, row in segment_stats.iterrows()
-        ]
-    
-    def process_inventory_metrics(self, df: pd.DataFrame) -> InventoryMetrics:
-        """Process inventory-related metrics"""
-        df = df.copy()
-        
-        avg_stock_level = df['stock_level'].mean() if 'stock_level' in df.columns else 0
+
+        return pd.DataFrame({
+            'customer_segment': segment_stats['customer_segment'].astype(str),
+            'total_revenue': segment_stats['total_revenue'].astype(np.float64).round(2),
+            'customer_count': segment_stats['customer_count'].astype(np.int64),
+            'avg_revenue_per_customer': segment_stats['avg_revenue_per_customer'].astype(np.float64).round(2),
+            'avg_order_value': segment_stats['avg_order_value'].astype(np.float64).round(2),
+        })
+
+    def _plan_inventory_metrics(self, plan: AggregationPlan) -> None:
+        plan.scalar(
+            avg_stock_level=('stock_level', 'mean'),
+            avg_lead_time=('lead_time', 'mean'),
+            avg_supplier_delay=('supplier_delay', 'mean')
+        )
+        plan.group(
+            ('product_id',),
+            first_stock_level=('stock_level', 'first'),
+            first_unit_price=('unit_price', 'first')
+        )
+        # Stock level histogram, so the low-stock count can follow the changing average
+        plan.group(('stock_level',), row_count=('stock_level', 'size'))
+
+    def _build_inventory_metrics(self, plan: AggregationPlan) -> Record:
+        avg_stock_level = plan.value('avg_stock_level')
         low_stock_threshold = avg_stock_level * 0.3  # Products below 30% of average
-        low_stock_products = len(df[df['stock_level'] < low_stock_threshold]) if 'stock_level' in df.columns else 0
-        avg_lead_time = df['lead_time'].mean() if 'lead_time' in df.columns else 0
-        avg_supplier_delay = df['supplier_delay'].mean() if 'supplier_delay' in df.columns else 0
-        
-        # Calculate inventory value (stock_level * unit_price)
-        if 'stock_level' in df.columns and 'unit_price' in df.columns:
-            df['inventory_value'] = df['stock_level'] * df['unit_price']
-            total_inventory_value = df.groupby('product_id')['inventory_value'].first().sum()
+        stock_levels = plan.result('stock_level')
+        low_stock_products = 0
+        if 'row_count' in stock_levels.columns:
+            low_stock_products = stock_levels.loc[stock_levels.index < low_stock_threshold, 'row_count'].sum()
+        avg_lead_time = plan.value('avg_lead_time')
+        avg_supplier_delay = plan.value('avg_supplier_delay')
+
+        # Calculate inventory value (stock_level * unit_price) per product
+        per_product = plan.result('product_id')
+        if 'first_stock_level' in per_product.columns and 'first_unit_price' in per_product.columns:
+            total_inventory_value = (per_product['first_stock_level'] * per_product['first_unit_price']).sum()
         else:
             total_inventory_value = None
-        
-        return InventoryMetrics(
+
+        return dict(
             avg_stock_level=round(float(avg_stock_level), 2),
             low_stock_products=int(low_stock_products),
             avg_lead_time=round(float(avg_lead_time), 2),
@@ -0,0 +1,160 @@
+import pandas as pd
+from services.schema import to_int
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+
+class PreparedDataset:
+    """
+    Sales rows with the derived date columns computed once at load time.
+
+    ``date_of_purchase`` is parsed to datetime and ``year``, ``month`` and
+    ``year_month`` (a monthly Period) are added when the dataset is fetched.
+    The data is shared by every request and must be treated as read-only;
+    processors select from it instead of copying.
+
+    A dataset is either backed by an in-memory frame or lazily by a columnar
+    source (see :meth:`lazy`), in which case each column is materialized on
+    first access. Processors ask for the columns they need through
+    :meth:`select`, so narrow endpoints never load the rest.
+
+    ``version`` identifies the source objects the rows were loaded from and
+    changes whenever they do. Ad-hoc datasets built from a bare DataFrame
+    have no version and are never response-cached.
+
+    ``parts`` maps each source object key to ``(etag, size, start, stop)``:
+    the object identity it was loaded from and its row range in ``frame``.
+    Incremental refreshes use it to reuse rows of unchanged objects.
+    """
+
+    def __init__(self, frame: pd.DataFrame, version: Optional[str] = None,
+                 parts: Optional[Dict[str, Tuple[str, int, int, int]]] = None):
+        # Shallow copy: new columns don't leak into the caller's frame and
+        # no column data is duplicated
+        self._init(self.prepare_frame(frame.copy(deep=False)), None, None, 0, version, parts)
+
+    def _init(self, frame: Optional[pd.DataFrame], loader: Optional[Callable[[str], pd.Series]],
+              names: Optional[List[str]], num_rows: int, version: Optional[str],
+              parts: Optional[Dict[str, Tuple[str, int, int, int]]]) -> None:
+        self._frame = frame
+        self._loader = loader
+        self._names = list(frame.columns) if frame is not None else list(names)
+        self._num_rows = len(frame) if frame is not None else num_rows
+        self._loaded: Dict[str, pd.Series] = {}
+        self.version = version
+        self.parts = parts or {}
+
+    @classmethod
+    def from_prepared(cls, frame: pd.DataFrame, version: Optional[str] = None,
+                      parts: Optional[Dict[str, Tuple[str, int, int, int]]] = None) -> "PreparedDataset":
+        """Wrap a frame whose rows already went through :meth:`prepare_frame`"""
+        dataset = cls.__new__(cls)
+        dataset._init(frame, None, None, 0, version, parts)
+        return dataset
+
+    @classmethod
+    def lazy(cls, names: List[str], num_rows: int, loader: Callable[[str], pd.Series],
+             version: Optional[str] = None,
+             parts: Optional[Dict[str, Tuple[str, int, int, int]]] = None) -> "PreparedDataset":
+        """
+        Dataset over an already prepared columnar source.
+        ``loader(name)`` returns one column as a Series and is called at most
+        once per column.
+        """
+        dataset = cls.__new__(cls)
+        dataset._init(None, loader, names, num_rows, version, parts)
+        return dataset
+
+    @classmethod
+    def ensure(cls, data: Union["PreparedDataset", pd.DataFrame]) -> "PreparedDataset":
+        """Wrap a raw DataFrame, or pass an already prepared dataset through"""
+        if isinstance(data, cls):
+            return data
+        return cls(data)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._names)
+
+    @property
+    def is_lazy(self) -> bool:
+        """Whether columns come from a columnar source such as the mapped snapshot"""
+        return self._loader is not None
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """Every column as one frame; materializes a lazy dataset completely"""
+        if self._frame is None:
+            # Built from the loaded columns without copying them; they stay
+            # cached because other threads may be reading the same dataset
+            self._frame = self.select(self._names)
+        return self._frame
+
+    @property
+    def materialized_columns(self) -> List[str]:
+        if self._frame is not None:
+            return list(self._names)
+        return [name for name in self._names if name in self._loaded]
+
+    def select(self, columns: Iterable[str]) -> pd.DataFrame:
+        """Frame with just the given columns, loading any that aren't in memory yet"""
+        columns = list(columns)
+        if self._frame is not None:
+            return self._frame[columns]
+        return pd.DataFrame(
+            {name: self._column(name) for name in columns},
+            index=pd.RangeIndex(self._num_rows),
+            copy=False
+        )
+
+    def take(self, rows: Sequence[int]) -> "PreparedDataset":
+        """
+        Unversioned dataset over the given row positions.
+        Columns are gathered from this dataset only when first used.
+        """
+        return PreparedDataset.lazy(
+            self._names,
+            len(rows),
+            lambda name: self.select([name])[name].take(rows).reset_index(drop=True)
+        )
+
+    def _column(self, name: str) -> pd.Series:
+        series = self._loaded.get(name)
+        if series is None:
+            if name not in self._names:
+                raise KeyError(name)
+            series = self._loader(name)
+            series.index = pd.RangeIndex(self._num_rows)
+            # Two threads may load the same column; either copy is fine
+            self._loaded[name] = series
+        return series
+
+    def __len__(self) -> int:
+        return self._num_rows
+
+    @staticmethod
+    def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+        """Parse dates and add year/month/year_month columns, in place"""
+        if 'date_of_purchase' in df.columns:
+            dates = pd.to_datetime(df['date_of_purchase'])
+            df['date_of_purchase'] = dates
+            if 'year' not in df.columns:
+                df['year'] = dates.dt.year
+            if 'month' not in df.columns:
+                df['month'] = dates.dt.month
+            df['year_month'] = dates.dt.to_period('M')
+
+        # Partitioned extracts carry year/month as text; store them as int32
+        # like the other integer columns
+        for name in ('year', 'month'):
+            if name in df.columns:
+                df[name] = to_int(pd.to_numeric(df[name], errors='coerce'))
+
+        if 'year_month' not in df.columns and 'year' in df.columns and 'month' in df.columns:
+            # Through datetimes: PeriodIndex.from_fields needs pandas 2.2
+            fields = {'year': df['year'].astype('float64'), 'month': df['month'].astype('float64'), 'day': 1}
+            first_days = pd.to_datetime(pd.DataFrame(fields, index=df.index))
+            df['year_month'] = first_days.dt.to_period('M')
+        return df
+
+
+DatasetLike = Union[PreparedDataset, pd.DataFrame]
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+from services.dataset import PreparedDataset
+
+# Columns the dashboard endpoints can be filtered on
+FILTER_COLUMNS = ("location", "category", "customer_segment", "product_id")
+
+_NO_ROWS = np.array([], dtype=np.int32)
+
+
+class FilterIndex:
+    """
+    Inverted index from each value of the filterable columns to the sorted
+    positions of the rows holding it.
+
+    Built once per dataset version. A filtered request looks up the row
+    array of every filter value and intersects them, instead of comparing
+    the full column on each request.
+    """
+
+    def __init__(self, dataset: PreparedDataset):
+        self.version = dataset.version
+        self.num_rows = len(dataset)
+        self._rows: Dict[str, Dict[Any, np.ndarray]] = {}
+        for column in FILTER_COLUMNS:
+            if column in dataset.columns:
+                self._rows[column] = self._build(dataset.select([column])[column])
+
+    @staticmethod
+    def _build(values: pd.Series) -> Dict[Any, np.ndarray]:
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            uniques = values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values)
+        # A stable sort by value code keeps the rows of each value in ascending order
+        order = np.argsort(codes, kind='stable')
+        dtype = np.int32 if len(values) < np.iinfo(np.int32).max else np.int64
+        order = order.astype(dtype, copy=False)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        # Missing values (code -1) sort first and are never matched
+        start = len(codes) - int(counts.sum())
+        bounds = start + np.concatenate(([0], np.cumsum(counts)))
+        return {
+            value: order[bounds[i]:bounds[i + 1]]
+            for i, value in enumerate(uniques.tolist()) if counts[i]
+        }
+
+    def rows(self, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Sorted positions of rows matching every set filter; None when no filter is set"""
+        matches = []
+        for column, value in filters.items():
+            if value is None:
+                continue
+            matches.append(self._rows.get(column, {}).get(value, _NO_ROWS))
+        if not matches:
+            return None
+        # Intersect from the most selective value up
+        matches.sort(key=len)
+        selected = matches[0]
+        for rows in matches[1:]:
+            if len(selected) == 0:
+                break
+            selected = np.intersect1d(selected, rows, assume_unique=True)
+        return selected
+
+    def values(self, column: str) -> List[Any]:
+        """Distinct values of a filterable column, sorted"""
+        return sorted(self._rows.get(column, {}))
@@ -1,18 +1,97 @@
 import os
-import joblib
+import io
+import hashlib
+import csv
+import math
+import numpy as np
 import pandas as pd
 import pickle
-from typing import Dict, List, Any, Union
+from typing import Dict, List, Any, Optional, Union
+from services.prediction_batcher import MicroBatcher, PredictionError
+from services.prediction_cache import PredictionCache
+
+class FeatureTemplate:
+    """
+    Input layout of one model, compiled once when the model is loaded:
+    the default value of every feature, in the model's feature order, and
+    the position of each feature name.
+
+    A request is written straight into a copy of the default row (or a
+    row of a preallocated matrix for batches), so preparing an input costs
+    a dictionary lookup per provided value rather than a DataFrame build.
+    """
+
+    # Defaults for missing numeric features (e.g., mean values or 0)
+    # In a real app, these should be fetched from historical data context
+    DEFAULTS = {
+        'prev_quantity': 100,
+        'lag_2_quantity': 100,
+        'lag_3_quantity': 100,
+        'rolling_mean_quantity': 100,
+        'stock_pressure': 0.5,
+        'promo_effect': 0,
+        'day_of_week': 2, # Wednesday
+        'month': 7,       # July
+        'is_weekend': 0,
+        'days_since_start': 1000,
+    }
+
+    def __init__(self, feature_names: List[str]):
+        self.feature_names = [str(name) for name in feature_names]
+        self.index = {name: position for position, name in enumerate(self.feature_names)}
+        self.defaults = np.array([self._default(name) for name in self.feature_names], dtype=np.float64)
+
+    @classmethod
+    def for_model(cls, model: Any) -> Optional["FeatureTemplate"]:
+        """Template of a model trained on named features, else None"""
+        if not hasattr(model, 'feature_names_in_'):
+            return None
+        return cls(list(model.feature_names_in_))
+
+    @classmethod
+    def _default(cls, feature: str) -> float:
+        if feature in cls.DEFAULTS:
+            return cls.DEFAULTS[feature]
+        if feature.startswith('holiday_name_'):
+            return 0
+        if feature.startswith('weather_condition_'):
+            # Default to Sunny if not specified
+            return 1 if feature == 'weather_condition_Sunny' else 0
+        return 0 # Default fallback
+
+    def matrix(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        """One row per request: the defaults overwritten by the provided values; unknown names are ignored"""
+        matrix = np.repeat(self.defaults[np.newaxis, :], len(rows), axis=0)
+        index = self.index
+        for i, row in enumerate(rows):
+            for name, value in row.items():
+                position = index.get(name)
+                if position is not None:
+                    matrix[i, position] = value
+        return matrix
+
 
 class MLService:
     """Service for handling ML model predictions"""
     
     def __init__(self):
         self.models = {}
+        self.templates: Dict[str, Optional[FeatureTemplate]] = {}
+        # Content hash of each model file; part of every prediction cache key
+        self.model_versions: Dict[str, str] = {}
+        self.cache = PredictionCache()
         self.base_path = os.path.join(os.path.dirname(__file__), "..", "..", "ml model pkl")
         print(f"ML Service: Searching for models in {os.path.abspath(self.base_path)}")
         self._load_models()
-        
+        # Concurrent single-row requests share one predict call
+        self.batcher = MicroBatcher(self.predict_batch)
+
+    def reload_models(self) -> Dict[str, Any]:
+        """Load the model files again, e.g. after they were replaced, and drop every cached prediction"""
+        self._load_models()
+        self.cache.clear()
+        return {**self.get_model_status(), "versions": dict(self.model_versions)}
+
     def _load_models(self):
         """Load available ML models from the external directory"""
         try:
@@ -22,7 +101,9 @@ class MLService:
                 print(f"Loading Sales Model from {sales_model_path}")
                 try:
                     with open(sales_model_path, 'rb') as f:
-                        self.models['sales'] = pickle.load(f)
+                        content = f.read()
+                    self.model_versions['sales'] = hashlib.sha1(content).hexdigest()[:16]
+                    self.models['sales'] = pickle.loads(content)
                     print("Sales Model loaded successfully")
                 except Exception as e:
                     print(f"Error loading Sales Model: {e}")
@@ -35,7 +116,9 @@ class MLService:
                 print(f"Loading Stock Model from {stock_model_path}")
                 try:
                     with open(stock_model_path, 'rb') as f:
-                        self.models['stock'] = pickle.load(f)
+                        content = f.read()
+                    self.model_versions['stock'] = hashlib.sha1(content).hexdigest()[:16]
+                    self.models['stock'] = pickle.loads(content)
                     print("Stock Model loaded successfully")
                 except Exception as e:
                     print(f"Error loading Stock Model: {e}")
@@ -45,70 +128,126 @@ class MLService:
         except Exception as e:
             print(f"Critical Error in ML Service: {e}")
 
-    def _prepare_input(self, data: Dict[str, Any], model_name: str) -> pd.DataFrame:
-        """Prepare input DataFrame matching model features"""
+        # Compile each model's input layout once instead of on every prediction
+        self.templates = {name: FeatureTemplate.for_model(model) for name, model in self.models.items()}
+
+    def _prepare_input(self, data: Dict[str, Any], model_name: str) -> Union[np.ndarray, pd.DataFrame]:
+        """Prepare the model input for one request"""
+        return self._prepare_rows([data], model_name)
+
+    def _prepare_rows(self, rows: List[Dict[str, Any]], model_name: str) -> Union[np.ndarray, pd.DataFrame]:
+        """Prepare one model input, a row per request, in the model's feature order"""
         if model_name not in self.models:
             raise ValueError(f"Model {model_name} not loaded")
-            
-        model = self.models[model_name]
-        if not hasattr(model, 'feature_names_in_'):
+
+        template = self.templates.get(model_name)
+        if template is None:
             # Fallback if features are not stored in model
-            return pd.DataFrame([data])
-            
-        required_features = model.feature_names_in_
-        
-        # Create dictionary with defaults
-        input_data = {}
-        
-        # 1. Map provided inputs
-        for key, value in data.items():
-            if key in required_features:
-                input_data[key] = value
-                
-        # 2. Fill missing numeric features with defaults (e.g., mean values or 0)
-        # In a real app, these should be fetched from historical data context
-        defaults = {
-            'prev_quantity': 100,
-            'lag_2_quantity': 100,
-            'lag_3_quantity': 100,
-            'rolling_mean_quantity': 100,
-            'stock_pressure': 0.5,
-            'promo_effect': 0,
-            'day_of_week': 2, # Wednesday
-            'month': 7,       # July
-            'is_weekend': 0,
-            'days_since_start': 1000,
+            return pd.DataFrame(rows)
+        return template.matrix(rows)
+
+    def _predict_features(self, model_name: str, features: Union[np.ndarray, pd.DataFrame]) -> List[Any]:
+        """Predictions for prepared rows; only rows missing from the cache are scored"""
+        # Version before model: a reload in between can only file a new
+        # prediction under the old version, never the reverse
+        version = self.model_versions.get(model_name)
+        model = self.models[model_name]
+        if not isinstance(features, np.ndarray) or not self.cache.enabled:
+            return model.predict(features).tolist()
+
+        keys = [self.cache.key(model_name, version, row) for row in features]
+        results = [self.cache.get(key) for key in keys]
+        missing = [position for position, result in enumerate(results) if result is None]
+        if missing:
+            for position, result in zip(missing, model.predict(features[missing]).tolist()):
+                results[position] = result
+                self.cache.put(keys[position], result)
+        return results
+
+    def _cached_prediction(self, model_name: str, data: Dict[str, Any]) -> Optional[Any]:
+        """Cached prediction for one request, or None (misses are counted when the row is scored)"""
+        template = self.templates.get(model_name)
+        if template is None or not self.cache.enabled:
+            return None
+        try:
+            features = template.matrix([self._validate_row(data)])[0]
+        except ValueError:
+            return None
+        key = self.cache.key(model_name, self.model_versions.get(model_name), features)
+        return self.cache.get(key, record_miss=False)
+
+    @staticmethod
+    def _validate_row(row: Any) -> Dict[str, float]:
+        """Feature values of one batch row as floats; missing (null or empty) values are left to the defaults"""
+        if not isinstance(row, dict):
+            raise ValueError("Row must be an object of feature values")
+        values = {}
+        for key, value in row.items():
+            if value is None or (isinstance(value, str) and not value.strip()):
+                continue
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Feature '{key}' must be a number, got {value!r}")
+            if not math.isfinite(number):
+                raise ValueError(f"Feature '{key}' must be finite, got {value!r}")
+            values[str(key)] = number
+        return values
+
+    @staticmethod
+    def rows_from_csv(content: bytes) -> List[Dict[str, str]]:
+        """Feature rows of a CSV with a header of feature names"""
+        reader = csv.DictReader(io.StringIO(content.decode('utf-8-sig')))
+        if not reader.fieldnames:
+            raise ValueError("CSV has no header row")
+        return [
+            {key: value for key, value in row.items() if key is not None and value not in (None, "")}
+            for row in reader
+        ]
+
+    def predict_batch(self, model_name: str, rows: List[Any]) -> Dict[str, Any]:
+        """
+        Predict many feature rows with a single ``predict`` call.
+        Rows are validated one by one; predictions come back in input order,
+        with None and an entry in ``errors`` for each rejected row.
+        """
+        if model_name not in self.models:
+            raise ValueError(f"Model {model_name} not loaded")
+
+        valid_positions = []
+        valid_rows = []
+        errors = []
+        for position, row in enumerate(rows):
+            try:
+                valid_rows.append(self._validate_row(row))
+                valid_positions.append(position)
+            except ValueError as e:
+                errors.append({"row": position, "error": str(e)})
+
+        predictions: List[Optional[float]] = [None] * len(rows)
+        if valid_rows:
+            try:
+                features = self._prepare_rows(valid_rows, model_name)
+                results = self._predict_features(model_name, features)
+            except Exception as e:
+                raise PredictionError(model_name, str(e))
+            for position, result in zip(valid_positions, results):
+                predictions[position] = result
+
+        return {
+            "predictions": predictions,
+            "errors": errors,
+            "count": len(rows),
+            "predicted": len(valid_rows),
         }
-        
-        for feature in required_features:
-            if feature not in input_data:
-                if feature in defaults:
-                    input_data[feature] = defaults[feature]
-                elif feature.startswith('holiday_name_'):
-                    input_data[feature] = 0
-                elif feature.startswith('weather_condition_'):
-                    # Default to Sunny if not specified
-                    input_data[feature] = 1 if feature == 'weather_condition_Sunny' else 0
-                else:
-                    input_data[feature] = 0 # Default fallback
-                    
-        # Create DataFrame with exact column order
-        df = pd.DataFrame([input_data])
-        df = df[required_features] # Reorder columns
-        return df
 
     def predict_sales(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Make prediction using Sales Analysis model
         """
         try:
-            df = self._prepare_input(data, 'sales')
-            prediction = self.models['sales'].predict(df)
-            
-            result = prediction[0]
-            if hasattr(result, 'item'):
-                result = result.item()
-                
+            features = self._prepare_input(data, 'sales')
+            result = self._predict_features('sales', features)[0]
             return {"prediction": result}
         except Exception as e:
             import traceback
@@ -120,17 +259,29 @@ class MLService:
         Make prediction using Stock Replenishment model
         """
         try:
-            df = self._prepare_input(data, 'stock')
-            prediction = self.models['stock'].predict(df)
-            
-            result = prediction[0]
-            if hasattr(result, 'item'):
-                result = result.item()
-                
+            features = self._prepare_input(data, 'stock')
+            result = self._predict_features('stock', features)[0]
             return {"prediction": result}
         except Exception as e:
             raise ValueError(f"Stock prediction failed: {str(e)}")
 
+    async def predict_async(self, model_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Single-row prediction through the micro-batcher; same result as
+        ``predict_sales`` / ``predict_stock``. Cache hits skip the batch window.
+        Raises PredictionError for invalid rows and failed predictions.
+        """
+        cached = self._cached_prediction(model_name, data)
+        if cached is not None:
+            return {"prediction": cached}
+        try:
+            result = await self.batcher.submit(model_name, data)
+        except PredictionError:
+            raise
+        except ValueError as e:
+            raise PredictionError(model_name, str(e))
+        return {"prediction": result}
+
     def get_model_status(self) -> Dict[str, bool]:
         """Return which models are currently loaded"""
         return {
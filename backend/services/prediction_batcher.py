@@ -0,0 +1,147 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+# How long the first request of a batch waits for others to join it
+PREDICT_BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "2"))
+# A batch is flushed as soon as this many requests are waiting
+PREDICT_BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "64"))
+
+# Upper bounds of the batch size histogram buckets
+_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class PredictionError(ValueError):
+    """A row that could not be predicted; the message is the bare cause"""
+
+    def __init__(self, model_name: str, message: str):
+        super().__init__(message)
+        self.model_name = model_name
+
+
+class MicroBatcher:
+    """
+    Coalesces single-row predictions that arrive close together into one
+    vectorized ``predict`` call.
+
+    The first request for a model starts a ``window_ms`` timer, and the
+    batch is flushed when it fires or once ``max_batch_size`` requests are
+    waiting. Only one batch per model runs at a time: requests that arrive
+    while it predicts are collected and flushed together (up to
+    ``max_batch_size``) as soon as it finishes, so batches grow with load
+    instead of queueing up. Batches run on a dedicated thread. Each
+    caller's future is resolved with its own row's result or a
+    PredictionError.
+    """
+
+    def __init__(self, predict_batch: Callable[[str, List[Dict[str, Any]]], Dict[str, Any]],
+                 window_ms: float = PREDICT_BATCH_WINDOW_MS,
+                 max_batch_size: int = PREDICT_BATCH_MAX_SIZE):
+        self._predict_batch = predict_batch
+        self.window_ms = window_ms
+        self.max_batch_size = max(max_batch_size, 1)
+        self._pending: Dict[str, List[Tuple[Dict[str, Any], asyncio.Future, float]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        # The batch in flight for each model
+        self._running: Dict[str, asyncio.Task] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ml-predict")
+
+        # Metrics
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+        # Queue wait runs from submit until the batch starts predicting
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.size_histogram = {bucket: 0 for bucket in _SIZE_BUCKETS}
+        self.size_histogram["more"] = 0
+
+    async def submit(self, model_name: str, row: Dict[str, Any]) -> Any:
+        """Queue one row for ``model_name`` and wait for its prediction"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(model_name, [])
+        pending.append((row, future, time.perf_counter()))
+        if model_name in self._running:
+            # Flushed when the batch in flight finishes
+            pass
+        elif len(pending) >= self.max_batch_size:
+            self._flush(model_name)
+        elif model_name not in self._timers:
+            self._timers[model_name] = loop.call_later(self.window_ms / 1000, self._flush, model_name)
+        return await future
+
+    def _flush(self, model_name: str) -> None:
+        timer = self._timers.pop(model_name, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(model_name, [])
+        batch, rest = pending[:self.max_batch_size], pending[self.max_batch_size:]
+        if rest:
+            self._pending[model_name] = rest
+        if not batch:
+            return
+
+        self.requests += len(batch)
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        bucket = next((bound for bound in _SIZE_BUCKETS if len(batch) <= bound), "more")
+        self.size_histogram[bucket] += 1
+
+        task = asyncio.ensure_future(self._run(model_name, batch))
+        self._running[model_name] = task
+        task.add_done_callback(lambda _: self._batch_done(model_name))
+
+    def _batch_done(self, model_name: str) -> None:
+        self._running.pop(model_name, None)
+        # Whatever gathered meanwhile has already waited a whole prediction
+        if self._pending.get(model_name):
+            self._flush(model_name)
+
+    def _predict(self, model_name: str, rows: List[Dict[str, Any]]) -> Tuple[float, Dict[str, Any]]:
+        # Runs on the prediction thread; the start time ends the queue wait
+        return time.perf_counter(), self._predict_batch(model_name, rows)
+
+    async def _run(self, model_name: str, batch: List[Tuple[Dict[str, Any], asyncio.Future, float]]) -> None:
+        loop = asyncio.get_running_loop()
+        rows = [row for row, _, _ in batch]
+        try:
+            started, result = await loop.run_in_executor(self._executor, self._predict, model_name, rows)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.waited += len(batch)
+        for _, _, queued_at in batch:
+            wait = started - queued_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+        errors = {error["row"]: error["error"] for error in result["errors"]}
+        for position, (_, future, _) in enumerate(batch):
+            # A caller that gave up has a cancelled future
+            if future.done():
+                continue
+            if position in errors:
+                future.set_exception(PredictionError(model_name, errors[position]))
+            else:
+                future.set_result(result["predictions"][position])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window_ms,
+            "max_batch_size": self.max_batch_size,
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else None,
+            "largest_batch": self.largest_batch,
+            "batch_size_histogram": {str(bucket): count for bucket, count in self.size_histogram.items()},
+            "avg_queue_wait_ms": round(1000 * self.total_wait / self.waited, 3) if self.waited else None,
+            "max_queue_wait_ms": round(1000 * self.max_wait, 3),
+            "pending": sum(len(pending) for pending in self._pending.values()),
+        }
@@ -0,0 +1,70 @@
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# Upper bound on cached predictions across both models (0 disables the cache)
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "10000"))
+
+
+class PredictionCache:
+    """
+    Bounded LRU of model predictions keyed by model name, model version and
+    the fully defaulted feature vector.
+
+    Keys are built from the prepared input row, so requests that differ
+    only in field order or in leaving out a value versus sending its
+    default share an entry. The model version is part of every key and a
+    reload clears the cache, so a replaced model never serves an old
+    prediction. Shared by the event loop and the prediction thread.
+    """
+
+    def __init__(self, max_entries: int = PREDICTION_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(model_name: str, version: Optional[str], features: np.ndarray) -> Tuple[str, Optional[str], bytes]:
+        # Adding 0.0 folds -0.0 into 0.0, which the model cannot tell apart
+        return model_name, version, (features.astype(np.float64) + 0.0).tobytes()
+
+    def get(self, key: Hashable, record_miss: bool = True) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                if record_miss:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
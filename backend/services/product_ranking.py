@@ -0,0 +1,104 @@
+import json
+import base64
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Tuple
+
+# Ranking metrics accepted by /api/products/top and their aggregate columns
+RANKING_METRICS = {
+    "revenue": "total_revenue",
+    "quantity": "total_quantity",
+    "orders": "order_count",
+}
+
+
+def encode_cursor(metric: str, value: float, position: int) -> str:
+    payload = json.dumps([metric, value, position]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        metric, value, position = json.loads(base64.urlsafe_b64decode(padded))
+        return str(metric), float(value), int(position)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class ProductRanking:
+    """
+    Per-product totals as flat arrays, ranked on demand by partial selection.
+
+    Products are kept in (product_name, category) order, and ties on the
+    ranking metric are broken by that position. A page of ``k`` products
+    costs one partial selection (``np.partition``) over the catalogue plus a sort of the ``k``
+    selected rows, never a full sort. Cursors carry the metric value and
+    position of the last product returned, so the next page is everything
+    ranked strictly after it.
+    """
+
+    def __init__(self, products: pd.DataFrame, version: Optional[str] = None):
+        self.version = version
+        frame = products.reset_index()
+        if 'product_name' not in frame.columns or 'category' not in frame.columns:
+            # Grouping was unavailable (no product columns in the dataset)
+            frame = pd.DataFrame(columns=['product_name', 'category'] + list(products.columns))
+        names = frame['product_name'].astype(str).to_numpy(dtype=object)
+        categories = frame['category'].astype(str).to_numpy(dtype=object)
+        order = np.lexsort((categories, names))
+        self.product_names = names[order]
+        self.categories = categories[order]
+        self.columns: Dict[str, np.ndarray] = {
+            name: frame[name].to_numpy()[order] for name in products.columns
+        }
+
+    def __len__(self) -> int:
+        return len(self.product_names)
+
+    def top(self, metric: str = "revenue", limit: int = 10,
+            cursor: Optional[str] = None) -> Tuple[np.ndarray, Optional[str]]:
+        """Positions of the next ``limit`` products by ``metric``, and the cursor after them"""
+        if metric not in RANKING_METRICS:
+            raise ValueError(f"metric must be one of: {', '.join(RANKING_METRICS)}")
+        column = RANKING_METRICS[metric]
+        values = self.columns[column].astype(np.float64) if column in self.columns else np.zeros(len(self))
+
+        candidates = np.arange(len(values))
+        if cursor:
+            cursor_metric, last_value, last_position = decode_cursor(cursor)
+            if cursor_metric != metric:
+                raise ValueError("Cursor was issued for a different metric")
+            after = (values < last_value) | ((values == last_value) & (candidates > last_position))
+            candidates = np.flatnonzero(after)
+        if limit <= 0 or len(candidates) == 0:
+            return np.array([], dtype=np.int64), None
+
+        candidate_values = values[candidates]
+        k = min(limit, len(candidates))
+        if k < len(candidates):
+            # Everything above the k-th largest value, topped up with the
+            # lowest-positioned ties so pages are deterministic
+            kth = -np.partition(-candidate_values, k - 1)[k - 1]
+            above = np.flatnonzero(candidate_values > kth)
+            tied = np.flatnonzero(candidate_values == kth)[:k - len(above)]
+            picked = np.concatenate((above, tied))
+        else:
+            picked = np.arange(len(candidates))
+
+        rows = candidates[picked]
+        rows = rows[np.lexsort((rows, -values[rows]))]
+        next_cursor = None
+        if len(candidates) > k:
+            next_cursor = encode_cursor(metric, float(values[rows[-1]]), int(rows[-1]))
+        return rows, next_cursor
+
+    def frame(self, rows: np.ndarray) -> pd.DataFrame:
+        """The given products as a frame, in the given order"""
+        result = pd.DataFrame({
+            'product_name': self.product_names[rows],
+            'category': self.categories[rows],
+        })
+        for name, values in self.columns.items():
+            result[name] = values[rows]
+        return result
@@ -3,10 +3,19 @@ import pandas as pd
 import io
 import os
 import time
-from typing import Optional, List, Dict
+import hashlib
+import asyncio
+from typing import Optional, List, Dict, Tuple, Callable, Awaitable, Any
 from datetime import datetime, timedelta
 from botocore.exceptions import ClientError, NoCredentialsError
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from services.dataset import PreparedDataset
+from services.snapshot import DatasetSnapshot
+from services.schema import read_sales_csv, concat_frames, validate_sales_csv_sample
+
+class ListingChanged(Exception):
+    """An object was overwritten between listing and download"""
+
 
 class S3Service:
     """Service for interacting with AWS S3 to fetch CSV files with caching and parallel processing"""
@@ -23,7 +32,52 @@ class S3Service:
         self._cache = None
         self._cache_expiry = None
         self.cache_duration = timedelta(minutes=10)
+        # Workers that are not the snapshot loader only re-read the snapshot
+        # metadata, so they can check for a new version much more often
+        self.follow_interval = timedelta(seconds=int(os.getenv("DATASET_FOLLOW_SECONDS", "5")))
+        # Before the loader's first snapshot exists, followers poll for it for
+        # up to this long instead of loading the dataset themselves
+        self.follow_wait = float(os.getenv("DATASET_FOLLOW_WAIT_SECONDS", "120"))
+        self.follow_poll = 0.5
+
+        # Refreshes are single-flight; with stale-while-revalidate an expired
+        # dataset keeps being served while the refresh runs in the background
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.stale_while_revalidate = os.getenv("S3_STALE_WHILE_REVALIDATE", "true").lower() in ("1", "true", "yes")
+
+        # Local columnar copy of the last dataset for fast restarts and S3 outages
+        self.snapshot = DatasetSnapshot()
+
+        # Parallel download tuning: objects larger than the range threshold
+        # are fetched as concurrent byte-range GETs of range_chunk_size
+        self.download_workers = int(os.getenv("S3_DOWNLOAD_WORKERS", "8"))
+        self.range_threshold = int(os.getenv("S3_RANGE_THRESHOLD_MB", "32")) * 1024 * 1024
+        self.range_chunk_size = int(os.getenv("S3_RANGE_CHUNK_MB", "16")) * 1024 * 1024
+        # Listings tried before giving up when objects keep changing mid-download
+        self.listing_attempts = 3
+        self._download_executor = ThreadPoolExecutor(
+            max_workers=self.download_workers,
+            thread_name_prefix="s3-download"
+        )
+
+        # Blocking S3 calls and CSV parsing run here, never on the event loop
+        self.io_workers = int(os.getenv("S3_IO_WORKERS", "4"))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.io_workers,
+            thread_name_prefix="s3-io"
+        )
         
+        # Uploads stream to S3 as multipart parts of this size (S3 minimum is
+        # 5 MB); one part is the most an upload ever holds in memory
+        self.upload_bucket = "nexgen-raw-data"
+        self.upload_part_size = max(int(os.getenv("S3_UPLOAD_PART_MB", "8")), 5) * 1024 * 1024
+        self.upload_progress: Dict[str, Dict[str, Any]] = {}
+        # Finished uploads stay queryable until this many newer ones finish
+        self.upload_history = int(os.getenv("S3_UPLOAD_HISTORY", "100"))
+
+        # Callbacks told about new dataset versions and completed uploads
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+
         # Metadata files to ignore
         self.metadata_files = ["_SUCCESS", "_committed_", "_started_", "_temporary"]
         
@@ -56,102 +110,561 @@ class S3Service:
         filename = os.path.basename(key)
         return any(filename.startswith(prefix) for prefix in self.metadata_files)
         
-    def _process_file(self, key: str) -> Optional[pd.DataFrame]:
-        """Helper to process a single S3 file"""
+    def _process_file(self, key: str, body: bytes) -> Optional[pd.DataFrame]:
+        """Helper to parse a single downloaded S3 file"""
         try:
-            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
-            csv_content = response['Body'].read().decode('utf-8')
-            df_part = pd.read_csv(io.StringIO(csv_content))
-            return df_part
+            # The parser decodes the raw bytes itself; no intermediate str copy
+            return read_sales_csv(io.BytesIO(body))
         except Exception as e:
             print(f"Error reading file {key}: {e}")
             return None
 
+    def _byte_ranges(self, size: int) -> List[Tuple[int, int]]:
+        """Inclusive byte ranges to fetch an object of the given size in parallel"""
+        if size <= self.range_threshold:
+            return []
+        return [
+            (start, min(start + self.range_chunk_size, size) - 1)
+            for start in range(0, size, self.range_chunk_size)
+        ]
+
+    def _get_bytes(self, key: str, byte_range: Optional[Tuple[int, int]] = None,
+                   etag: Optional[str] = None) -> bytes:
+        """
+        GET an object, or one byte range of it. With ``etag`` the GET fails
+        with 412 if the object no longer is the listed version, so neither
+        stale data nor ranges of two versions are stored under that ETag.
+        """
+        params = {"Bucket": self.bucket_name, "Key": key}
+        if byte_range is not None:
+            params["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+        if etag:
+            params["IfMatch"] = etag
+        response = self.s3_client.get_object(**params)
+        return response['Body'].read()
+
+    @staticmethod
+    def _is_precondition_failure(error: Exception) -> bool:
+        if not isinstance(error, ClientError):
+            return False
+        response = error.response
+        return (response.get('Error', {}).get('Code') in ('PreconditionFailed', '412')
+                or response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 412)
+
+    def _download_objects(self, objects: List[Tuple[str, str, int]]) -> Dict[str, pd.DataFrame]:
+        """
+        Download and parse S3 objects with bounded parallelism.
+        ``objects`` are ``(key, etag, size)`` tuples from the listing. Every
+        whole-object GET and every byte-range GET of a large object is an
+        independent task on the download pool; each object is parsed as soon
+        as all of its parts have arrived. Raises ListingChanged if an object
+        was overwritten after it was listed.
+        """
+        tasks = {}
+        pending: Dict[str, int] = {}
+        parts: Dict[str, Dict[int, bytes]] = {}
+        for key, etag, size in objects:
+            ranges = self._byte_ranges(size)
+            parts[key] = {}
+            pending[key] = max(len(ranges), 1)
+            if not ranges:
+                tasks[self._download_executor.submit(self._get_bytes, key, None, etag)] = (key, 0)
+            for index, byte_range in enumerate(ranges):
+                future = self._download_executor.submit(self._get_bytes, key, byte_range, etag)
+                tasks[future] = (key, index)
+
+        frames = {}
+        failed = set()
+        overwritten = set()
+        for future in as_completed(tasks):
+            key, index = tasks[future]
+            if key in failed:
+                continue
+            try:
+                parts[key][index] = future.result()
+            except Exception as e:
+                if self._is_precondition_failure(e):
+                    overwritten.add(key)
+                else:
+                    print(f"Error downloading file {key}: {e}")
+                failed.add(key)
+                parts.pop(key, None)
+                continue
+
+            pending[key] -= 1
+            if pending[key] == 0:
+                chunks = parts.pop(key)
+                body = chunks[0] if len(chunks) == 1 else b"".join(chunks[i] for i in range(len(chunks)))
+                del chunks
+                df_part = self._process_file(key, body)
+                if df_part is not None:
+                    frames[key] = df_part
+        if overwritten:
+            raise ListingChanged(", ".join(sorted(overwritten)))
+        return frames
+
     async def fetch_csv_from_s3(self) -> pd.DataFrame:
         """
-        Fetch CSV data from S3 bucket.
-        Now simplified for a consolidated CSV file approach.
+        Fetch CSV data from S3 bucket as a DataFrame.
+        The frame is the shared, prepared cache entry and must not be modified.
+        """
+        dataset = await self.get_dataset()
+        return dataset.frame
+
+    async def _run_blocking(self, func: Callable[..., Any], *args) -> Any:
+        """Run a blocking call on the S3 executor so the event loop keeps serving"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def get_dataset(self) -> PreparedDataset:
+        """
+        Fetch the sales dataset from S3, parsed and prepared once per fetch.
+        Listing, downloads and parsing run on the S3 executor.
         """
         # Check cache
         if self._cache is not None and self._cache_expiry > datetime.now():
             return self._cache
 
+        refresh = self._start_refresh()
+        if self._cache is not None and self.stale_while_revalidate:
+            return self._cache
+
+        # Shield the shared refresh from callers that disconnect mid-wait
+        return await asyncio.shield(refresh)
+
+    async def warm_start(self) -> None:
+        """
+        Serve the on-disk snapshot immediately after a restart and revalidate
+        it against S3 in the background.
+        """
+        if self._cache is None:
+            restored = await self._run_blocking(self.snapshot.load)
+            if restored is not None:
+                self._cache = restored
+                self._cache_expiry = datetime.now()
+        self._start_refresh()
+
+    @property
+    def version(self) -> Optional[str]:
+        """Version of the dataset currently served, if one is loaded"""
+        return self._cache.version if self._cache is not None else None
+
+    async def revalidate(self) -> PreparedDataset:
+        """Check S3 for changed objects now, regardless of the cache expiry"""
+        return await asyncio.shield(self._start_refresh())
+
+    def add_listener(self, callback: Callable[[str, Dict[str, Any]], None]) -> None:
+        """
+        Call ``callback(event, payload)`` on the event loop when a new dataset
+        version is served (``dataset``) or an upload completes (``upload``).
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, event: str, payload: Dict[str, Any]) -> None:
+        for callback in self._listeners:
+            try:
+                callback(event, payload)
+            except Exception as e:
+                print(f"Warning: {event} listener failed: {e}")
+
+    def invalidate(self) -> None:
+        """Expire the cached dataset so the next request refreshes it"""
+        if self._cache is not None:
+            self._cache_expiry = datetime.now()
+
+    def _start_refresh(self) -> "asyncio.Task":
+        """Start a refresh unless one is already in flight, and return it"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+            self._refresh_task.add_done_callback(self._log_refresh_failure)
+        return self._refresh_task
+
+    @staticmethod
+    def _log_refresh_failure(task: "asyncio.Task") -> None:
+        # Background refreshes may have no awaiting caller to surface the error
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Warning: Dataset refresh failed: {task.exception()}")
+
+    async def _refresh(self) -> PreparedDataset:
+        previous = self._cache
+        loader = self.snapshot.acquire_loader()
+        try:
+            dataset = None
+            if not loader:
+                dataset = await self._follow_snapshot()
+                # The loader may have exited while this worker was waiting
+                loader = self.snapshot.is_loader
+            if dataset is None:
+                dataset = await self._run_blocking(self._load_dataset)
+        except Exception as e:
+            if self._cache is None:
+                raise
+            print(f"Warning: Dataset refresh failed: {e}. Serving previous data.")
+            return self._cache
+        if previous is not None and dataset.version == previous.version:
+            return self._store(dataset)
+        if loader:
+            dataset = await self._run_blocking(self._save_snapshot, dataset)
+        self._store(dataset)
+        self._notify("dataset", {
+            "version": dataset.version,
+            "previous_version": previous.version if previous is not None else None,
+            "rows": len(dataset),
+            "previous_rows": len(previous) if previous is not None else None,
+        })
+        return dataset
+
+    def _save_snapshot(self, dataset: PreparedDataset) -> PreparedDataset:
+        """
+        Persist a new dataset version unless the snapshot already holds it.
+        Returns the dataset to serve: the lazily mapped snapshot when one was
+        written, so columns no endpoint reads are released from memory.
+        """
+        meta = self.snapshot.read_metadata()
+        if meta is None or meta.get("version") != dataset.version:
+            if not self.snapshot.save(dataset):
+                return dataset
+        mapped = self.snapshot.load()
+        if mapped is None or mapped.version != dataset.version:
+            return dataset
+        return mapped
+
+    async def _follow_snapshot(self) -> Optional[PreparedDataset]:
+        """
+        Serve the loader's snapshot. Until its first one is published, poll
+        for it for up to ``follow_wait`` seconds, taking over as loader if
+        the lock frees up. None means this worker has to load on its own.
+        """
+        deadline = time.monotonic() + self.follow_wait
+        while True:
+            dataset = await self._run_blocking(self._attach_snapshot)
+            if dataset is not None or self.snapshot.acquire_loader():
+                return dataset
+            if time.monotonic() >= deadline:
+                print(f"Warning: No dataset snapshot after {self.follow_wait:g}s. Loading independently.")
+                return None
+            await asyncio.sleep(self.follow_poll)
+
+    def _attach_snapshot(self) -> Optional[PreparedDataset]:
+        """
+        Serve the version the loader process last published, mapping the
+        snapshot only when it changed. A dataset this worker loaded itself
+        is swapped for the mapping even when the versions match, so its
+        private copy is released. None until a snapshot exists.
+        """
+        meta = self.snapshot.read_metadata()
+        if meta is None:
+            return None
+        if self._cache is not None and self._cache.is_lazy and self._cache.version == meta.get("version"):
+            return self._cache
+        return self.snapshot.load()
+
+    def _load_dataset(self) -> PreparedDataset:
+        """
+        Blocking load of the dataset from S3, falling back to the local CSV.
+        Only new or changed objects are downloaded; rows of objects whose
+        ETag and size match the cached dataset are reused.
+        """
         # Try to fetch from S3
         if self.s3_client and self.bucket_name:
             try:
                 print(f"Fetching CSV data from s3://{self.bucket_name}/{self.s3_prefix}...")
-                paginator = self.s3_client.get_paginator('list_objects_v2')
-                pages = paginator.paginate(Bucket=self.bucket_name, Prefix=self.s3_prefix)
-                
-                keys_to_fetch = []
-                for page in pages:
-                    if 'Contents' not in page: continue
-                    for obj in page['Contents']:
-                        key = obj['Key']
-                        if self._is_csv_file(key) and not self._is_metadata_file(key):
-                            keys_to_fetch.append(key)
-                
-                if not keys_to_fetch:
-                    print("No CSV files found in S3. Falling back to local file.")
-                    return self._fetch_local_csv()
-                
-                # Fetch and combine all found CSVs (usually just one now)
-                dfs = []
-                for key in keys_to_fetch:
-                    df_part = self._process_file(key)
-                    if df_part is not None:
-                        dfs.append(df_part)
-
-                if not dfs:
-                    return self._fetch_local_csv()
-                    
-                # Combine all dataframes
-                final_df = pd.concat(dfs, ignore_index=True)
-                
-                print(f"Successfully fetched data. Total shape: {final_df.shape}")
-                
-                # Update Cache
-                self._cache = final_df
-                self._cache_expiry = datetime.now() + self.cache_duration
-                
-                return final_df
-                
+                for attempt in range(self.listing_attempts):
+                    listed = self._list_csv_objects()
+
+                    if not listed:
+                        print("No CSV files found in S3. Falling back to local file.")
+                        return self._load_local_dataset()
+
+                    try:
+                        dataset = self._merge_objects(listed)
+                    except ListingChanged as e:
+                        # The listing is stale; its ETags no longer describe the data
+                        if attempt + 1 == self.listing_attempts:
+                            raise
+                        print(f"S3 objects changed during download ({e}). Listing again.")
+                        continue
+                    if dataset is None:
+                        return self._load_local_dataset()
+                    return dataset
+
             except Exception as e:
                 print(f"Warning: Error accessing S3: {e}. Falling back.")
+                return self._load_fallback()
         
         # Fallback to local CSV file
-        return self._fetch_local_csv()
+        return self._load_local_dataset()
+
+    def _load_fallback(self) -> PreparedDataset:
+        """S3 is unreachable: keep the last S3 data (cached or snapshot) before the local CSV"""
+        if self._cache is not None and self._cache.parts:
+            return self._cache
+        meta = self.snapshot.read_metadata()
+        if meta is not None and meta.get("parts"):
+            restored = self.snapshot.load()
+            if restored is not None:
+                return restored
+        return self._load_local_dataset()
+
+    def _list_csv_objects(self) -> List[Tuple[str, str, int]]:
+        """List ``(key, etag, size)`` for every data CSV under the prefix"""
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=self.s3_prefix)
+
+        listed = []
+        for page in pages:
+            if 'Contents' not in page: continue
+            for obj in page['Contents']:
+                key = obj['Key']
+                if self._is_csv_file(key) and not self._is_metadata_file(key):
+                    listed.append((key, obj.get('ETag', ''), obj.get('Size', 0)))
+        return listed
+
+    def _merge_objects(self, listed: List[Tuple[str, str, int]]) -> Optional[PreparedDataset]:
+        """
+        Build the dataset for a listing, downloading only what changed.
+        Returns the cached dataset untouched when the listing matches it, and
+        None when no object could be loaded.
+        """
+        previous = self._cache
+        if previous is None:
+            # Fresh process: reuse rows and manifest from the local snapshot
+            previous = self.snapshot.load()
+        known = previous.parts if previous is not None else {}
+        changed = [
+            (key, etag, size) for key, etag, size in listed
+            if known.get(key, (None, None))[:2] != (etag, size)
+        ]
+        if not changed and len(known) == len(listed):
+            print("S3 objects unchanged. Keeping cached dataset.")
+            return previous
+
+        # Fetch new and changed CSVs in parallel and reuse the cached rows of
+        # unchanged ones. Objects are laid out in listing order, exactly as a
+        # cold load would, so a version always stands for one row order. A
+        # new object that lists after all others only appends rows, which
+        # lets aggregates be folded in incrementally.
+        frames = self._download_objects(changed) if changed else {}
+        order = []
+        for key, etag, size in listed:
+            if key in frames:
+                order.append((key, frames.pop(key)))
+            elif known.get(key, (None, None))[:2] == (etag, size):
+                order.append((key, None))
+
+        etags = {key: (etag, size) for key, etag, size in listed}
+        pieces = []
+        parts = {}
+        offset = 0
+        for key, frame in order:
+            if frame is not None:
+                piece = PreparedDataset.prepare_frame(frame)
+            else:
+                start, stop = known[key][2:]
+                piece = previous.frame.iloc[start:stop]
+            etag, size = etags[key]
+            parts[key] = (etag, size, offset, offset + len(piece))
+            offset += len(piece)
+            pieces.append(piece)
+
+        if not pieces:
+            return None
+
+        # Combine all dataframes
+        final_df = concat_frames(pieces)
+        print(f"Successfully fetched {len(changed)} new or changed file(s). Total shape: {final_df.shape}")
+
+        version = self._version_of([(key, etag, size) for key, (etag, size, _, _) in parts.items()])
+        return PreparedDataset.from_prepared(final_df, version=version, parts=parts)
+
+    @staticmethod
+    def _version_of(parts: List[tuple]) -> str:
+        """Stable dataset version from the identity of its source objects"""
+        digest = hashlib.sha1()
+        for part in sorted(parts):
+            digest.update("|".join(str(field) for field in part).encode('utf-8'))
+            digest.update(b"\n")
+        return digest.hexdigest()[:16]
+
+    def _store(self, dataset: PreparedDataset) -> PreparedDataset:
+        """Cache a freshly prepared dataset"""
+        self._cache = dataset
+        ttl = self.cache_duration if self.snapshot.is_loader else self.follow_interval
+        self._cache_expiry = datetime.now() + ttl
+        return dataset
+
+    def _load_local_dataset(self) -> PreparedDataset:
+        """Prepare the local CSV fallback"""
+        path = self._find_local_csv()
+        stat = os.stat(path)
+        version = self._version_of([(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)])
+        if self._cache is not None and self._cache.version == version:
+            return self._cache
+        meta = self.snapshot.read_metadata()
+        if meta is not None and meta.get("version") == version:
+            restored = self.snapshot.load()
+            if restored is not None:
+                return restored
+        return PreparedDataset(self._fetch_local_csv(), version=version)
     
     async def upload_file(self, file_content: bytes, filename: str) -> bool:
         """
-        Uploads a file to the nexgen-raw-data S3 bucket.
+        Uploads in-memory CSV content to the nexgen-raw-data S3 bucket.
+        """
+        buffer = io.BytesIO(file_content)
+
+        async def read(size: int) -> bytes:
+            return buffer.read(size)
+
+        return await self.upload_stream(read, filename, total_bytes=len(file_content))
+
+    async def upload_stream(self, read: Callable[[int], Awaitable[bytes]], filename: str,
+                            total_bytes: Optional[int] = None) -> bool:
+        """
+        Streams a CSV to the nexgen-raw-data S3 bucket without holding it in memory.
+
+        ``read(size)`` returns the next chunk of the file (b"" at the end).
+        The first part is validated against the raw sales schema before
+        anything is sent, and a ValueError is raised for invalid files.
+        Files larger than one part go through a multipart upload, which is
+        aborted if any part fails. Progress is tracked in ``upload_progress``.
         """
-        target_bucket = "nexgen-raw-data"
         key = f"uploads/{filename}"
-        
+        progress = {
+            "filename": filename,
+            "status": "validating",
+            "bytes_uploaded": 0,
+            "total_bytes": total_bytes,
+            "parts_uploaded": 0,
+            "error": None,
+        }
+        self._track_upload(filename, progress)
+
+        chunk = await self._read_part(read)
+        # A first part shorter than the part size is the whole file
+        complete = len(chunk) < self.upload_part_size
         try:
-            if not self.s3_client:
-                print("S3 client not initialized. Cannot upload.")
-                return False
-                
-            self.s3_client.put_object(
-                Bucket=target_bucket,
-                Key=key,
-                Body=file_content,
-                ContentType='text/csv'
-            )
-            print(f"Successfully uploaded {filename} to {target_bucket}/{key}")
-            # Invalidate cache so next fetch gets new data if processed
-            self._cache = None
+            validate_sales_csv_sample(chunk, complete=complete)
+        except ValueError as e:
+            progress.update(status="rejected", error=str(e))
+            raise
+
+        if not self.s3_client:
+            print("S3 client not initialized. Cannot upload.")
+            progress.update(status="failed", error="S3 client not initialized")
+            return False
+
+        progress["status"] = "uploading"
+        upload_id = None
+        try:
+            if complete:
+                await self._run_blocking(lambda: self.s3_client.put_object(
+                    Bucket=self.upload_bucket,
+                    Key=key,
+                    Body=chunk,
+                    ContentType='text/csv'
+                ))
+                progress.update(bytes_uploaded=len(chunk), parts_uploaded=1)
+            else:
+                response = await self._run_blocking(lambda: self.s3_client.create_multipart_upload(
+                    Bucket=self.upload_bucket,
+                    Key=key,
+                    ContentType='text/csv'
+                ))
+                upload_id = response['UploadId']
+                parts = []
+                while chunk:
+                    part_number = len(parts) + 1
+                    body = chunk
+                    result = await self._run_blocking(lambda: self.s3_client.upload_part(
+                        Bucket=self.upload_bucket,
+                        Key=key,
+                        UploadId=upload_id,
+                        PartNumber=part_number,
+                        Body=body
+                    ))
+                    parts.append({'PartNumber': part_number, 'ETag': result['ETag']})
+                    progress["bytes_uploaded"] += len(chunk)
+                    progress["parts_uploaded"] = len(parts)
+                    chunk = await self._read_part(read)
+
+                await self._run_blocking(lambda: self.s3_client.complete_multipart_upload(
+                    Bucket=self.upload_bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    MultipartUpload={'Parts': parts}
+                ))
+            progress["status"] = "completed"
+            print(f"Successfully uploaded {filename} to {self.upload_bucket}/{key}")
+            # Expire cache so next fetch picks up new data if processed
+            self.invalidate()
+            self._notify("upload", {
+                "filename": filename,
+                "bucket": self.upload_bucket,
+                "key": key,
+                "bytes": progress["bytes_uploaded"],
+            })
             return True
         except Exception as e:
             print(f"Error uploading to S3: {e}")
+            progress.update(status="failed", error=str(e))
+            if upload_id is not None:
+                try:
+                    await self._run_blocking(lambda: self.s3_client.abort_multipart_upload(
+                        Bucket=self.upload_bucket,
+                        Key=key,
+                        UploadId=upload_id
+                    ))
+                except Exception as abort_error:
+                    print(f"Warning: Could not abort multipart upload {upload_id}: {abort_error}")
             return False
 
+    def _track_upload(self, filename: str, progress: Dict[str, Any]) -> None:
+        """Register an upload, forgetting the oldest finished ones past ``upload_history``"""
+        # Re-inserting moves a repeated filename to the newest position
+        self.upload_progress.pop(filename, None)
+        self.upload_progress[filename] = progress
+        finished = [
+            name for name, entry in self.upload_progress.items()
+            if entry["status"] in ("rejected", "completed", "failed")
+        ]
+        for name in finished[:max(len(finished) - self.upload_history, 0)]:
+            del self.upload_progress[name]
+
+    async def _read_part(self, read: Callable[[int], Awaitable[bytes]]) -> bytes:
+        """Read up to one upload part; short reads are joined until the part is full or the file ends"""
+        chunks = []
+        size = 0
+        while size < self.upload_part_size:
+            chunk = await read(self.upload_part_size - size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        return b"".join(chunks)
+
+    def get_upload_progress(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Progress of the most recent upload of ``filename``, if any"""
+        progress = self.upload_progress.get(filename)
+        if progress is None:
+            return None
+        result = dict(progress)
+        if progress["total_bytes"]:
+            result["percent"] = round(100 * progress["bytes_uploaded"] / progress["total_bytes"], 1)
+        else:
+            result["percent"] = 100.0 if progress["status"] == "completed" else None
+        return result
+
     def _fetch_local_csv(self) -> pd.DataFrame:
         """
         Fallback method to load CSV from local file system.
         """
+        path = self._find_local_csv()
+        print(f"Loading CSV from local file: {path}")
+        return read_sales_csv(path)
+
+    def _find_local_csv(self) -> str:
+        """Locate the local fallback CSV"""
         local_csv_path = os.getenv("LOCAL_CSV_PATH", "../../NexGen_Dataset.csv")
         possible_paths = [
             local_csv_path,
@@ -161,8 +674,6 @@ class S3Service:
         
         for path in possible_paths:
             if os.path.exists(path):
-                print(f"Loading CSV from local file: {path}")
-                df = pd.read_csv(path)
-                return df
+                return path
         
         raise FileNotFoundError(f"Could not find CSV file. Tried: {possible_paths}")
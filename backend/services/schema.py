@@ -0,0 +1,188 @@
+import io
+import pandas as pd
+from typing import List, Dict, IO, Union
+
+try:
+    import pyarrow  # noqa: F401  (enables pandas' Arrow CSV engine)
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+# Column types of the sales extract. Mirrors SCHEMA in
+# Airflow_with_Spark/include/scripts/extract.py (StringType -> "string",
+# IntegerType -> "integer", DoubleType -> "double"); year/month are added
+# by transform.py and date_of_purchase is parsed by PreparedDataset.
+SALES_SCHEMA: Dict[str, str] = {
+    "customer_id": "integer",
+    "unit_price": "double",
+    "is_promotion": "integer",
+    "holiday_name": "string",
+    "weather_condition": "string",
+    "customer_segment": "string",
+    "product_id": "integer",
+    "customer_income": "double",
+    "competitor_price": "double",
+    "marketing_spend": "double",
+    "product_name": "string",
+    "lead_time": "integer",
+    "stock_level": "integer",
+    "supplier_delay": "integer",
+    "shelf_life": "integer",
+    "category": "string",
+    "date_of_purchase": "date",
+    "amount": "double",
+    "quantity": "integer",
+    "location": "string",
+    "year": "integer",
+    "month": "integer",
+}
+
+# Columns of a raw upload, in file order. extract.py applies SCHEMA by
+# position, so uploaded CSVs must carry exactly these headers in this order.
+RAW_COLUMNS: List[str] = [name for name in SALES_SCHEMA if name not in ("year", "month")]
+
+# Doubles that feed revenue totals stay float64 so rounded sums don't drift;
+# the remaining doubles are only ever averaged and are stored as float32
+MONEY_COLUMNS = {"amount", "unit_price"}
+
+# transform.py casts is_promotion to boolean, so it may arrive as 0/1 or
+# true/false; it is parsed as a bool either way and stored as int8
+BOOLEAN_COLUMNS = {"is_promotion"}
+
+# Low-cardinality text columns, dictionary-encoded as pandas categoricals
+CATEGORICAL_COLUMNS: List[str] = [
+    name for name, kind in SALES_SCHEMA.items() if kind == "string"
+]
+
+
+def _read_dtype(name: str, kind: str) -> str:
+    if kind == "string":
+        return "category"
+    # Nullable while parsing so a missing value doesn't fail the file
+    if name in BOOLEAN_COLUMNS:
+        return "boolean"
+    if kind == "integer":
+        return "Int32"
+    return "float64" if name in MONEY_COLUMNS else "float32"
+
+
+# Parser dtypes for every typed column; date_of_purchase is left as text
+# and parsed by PreparedDataset
+READ_DTYPES: Dict[str, str] = {
+    name: _read_dtype(name, kind) for name, kind in SALES_SCHEMA.items() if kind != "date"
+}
+
+
+def read_sales_csv(source: Union[str, IO[bytes]]) -> pd.DataFrame:
+    """
+    Parse a sales CSV into the compact in-memory schema.
+    Every column gets its type from SALES_SCHEMA (through the Arrow CSV
+    engine when pyarrow is installed), so each file and dataset version
+    ends up with the same dtypes whatever its value ranges.
+    """
+    df = pd.read_csv(source, engine=CSV_ENGINE, dtype=READ_DTYPES)
+    return apply_schema(df)
+
+
+def to_int(column: pd.Series, dtype: str = "int32") -> pd.Series:
+    """Integer column of ``dtype``, or its nullable form when values are missing"""
+    if column.isna().any():
+        return column.astype(dtype.capitalize())
+    # Through numpy: nullable booleans cast to the nullable integer otherwise
+    return pd.Series(column.to_numpy(dtype=dtype), index=column.index, name=column.name)
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast known columns of a freshly parsed frame to their schema dtypes, in place"""
+    for name, kind in SALES_SCHEMA.items():
+        if name not in df.columns:
+            continue
+        column = df[name]
+        if kind == "string":
+            if not isinstance(column.dtype, pd.CategoricalDtype):
+                df[name] = column.astype("category")
+        elif name in BOOLEAN_COLUMNS:
+            df[name] = to_int(column, "int8")
+        elif kind == "integer":
+            df[name] = to_int(column)
+        elif kind == "double":
+            df[name] = column.astype("float64" if name in MONEY_COLUMNS else "float32")
+    return df
+
+
+def validate_sales_csv_sample(sample: bytes, complete: bool = False) -> None:
+    """
+    Check the start of an uploaded CSV against the raw sales schema.
+    The header must match RAW_COLUMNS and every complete row in the sample
+    must parse to its column type. ``complete`` marks a sample that is the
+    whole file, whose last line may lack a trailing newline.
+    Raises ValueError describing the first problem found.
+    """
+    if not complete:
+        # Drop the row cut off at the chunk boundary
+        end = sample.rfind(b"\n")
+        if end < 0:
+            raise ValueError("CSV header is missing or longer than the first upload chunk")
+        sample = sample[:end + 1]
+    try:
+        text = sample.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("CSV must be UTF-8 encoded")
+    try:
+        df = pd.read_csv(io.StringIO(text), dtype=str, keep_default_na=False, skipinitialspace=True)
+    except Exception as e:
+        raise ValueError(f"Could not parse CSV: {e}")
+
+    header = [str(name).strip() for name in df.columns]
+    if header != RAW_COLUMNS:
+        missing = [name for name in RAW_COLUMNS if name not in header]
+        unexpected = [name for name in header if name not in RAW_COLUMNS]
+        if missing or unexpected:
+            raise ValueError(
+                f"CSV columns do not match the sales schema "
+                f"(missing: {missing}, unexpected: {unexpected})"
+            )
+        raise ValueError(f"CSV columns must be in the order: {', '.join(RAW_COLUMNS)}")
+    df.columns = header
+
+    for name in RAW_COLUMNS:
+        kind = SALES_SCHEMA[name]
+        values = df[name].str.strip()
+        values = values[values != ""]
+        if kind in ("integer", "double"):
+            parsed = pd.to_numeric(values, errors="coerce")
+            invalid = parsed.isna()
+            if kind == "integer":
+                invalid |= (parsed % 1) != 0
+        elif kind == "date":
+            invalid = pd.to_datetime(values, errors="coerce", format="mixed").isna()
+        else:
+            continue
+        if invalid.any():
+            row = invalid.idxmax()
+            raise ValueError(f"Invalid {kind} value {values[row]!r} in column {name} (data row {row + 1})")
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate frames while keeping categorical columns categorical.
+    pd.concat falls back to object dtype when categories differ, so the
+    pieces are first aligned to the union of their categories.
+    """
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+
+    aligned = [frame.copy(deep=False) for frame in frames]
+    for name in frames[0].columns:
+        if not all(
+            name in frame.columns and isinstance(frame[name].dtype, pd.CategoricalDtype)
+            for frame in frames
+        ):
+            continue
+        categories = frames[0][name].cat.categories
+        for frame in frames[1:]:
+            categories = categories.union(frame[name].cat.categories, sort=False)
+        for frame in aligned:
+            if not frame[name].cat.categories.equals(categories):
+                frame[name] = frame[name].cat.set_categories(categories)
+    return pd.concat(aligned, ignore_index=True)
@@ -0,0 +1,157 @@
+import os
+import json
+import pandas as pd
+from typing import Optional, Dict, Any
+from services.dataset import PreparedDataset
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # Snapshots are optional; without pyarrow every start parses CSV
+    pa = None
+
+try:
+    import fcntl
+except ImportError:  # No flock on Windows; every process loads for itself
+    fcntl = None
+
+
+class DatasetSnapshot:
+    """
+    On-disk Arrow IPC snapshot of the prepared dataset.
+
+    Written after every fetch that produces a new dataset version and read
+    back through a memory map, so a restarted worker (or one that cannot
+    reach S3) gets its data from local disk instead of re-downloading and
+    re-parsing CSV. The dataset version and per-object manifest travel in
+    the file's schema metadata, which lets incremental refreshes pick up
+    where the previous process left off.
+
+    Loading is lazy: the table is only mapped, and each column becomes a
+    pandas Series on first access. Null-free numeric columns stay views
+    over the mapped file.
+
+    The snapshot is also how worker processes share one copy of the data.
+    One process per snapshot path holds an advisory lock and is the loader:
+    it alone fetches from S3 and publishes new versions (an atomic rename).
+    Every other worker maps the published file, so the OS page cache holds
+    the columns once however many workers there are.
+    """
+
+    METADATA_KEY = b"nexgen"
+
+    def __init__(self, path: Optional[str] = None):
+        default_path = os.path.join(os.path.dirname(__file__), "..", ".cache", "nexgen_dataset.arrow")
+        self.path = path if path is not None else os.getenv("DATASET_SNAPSHOT_PATH", default_path)
+        self.shared = os.getenv("DATASET_SHARED_SNAPSHOT", "true").lower() in ("1", "true", "yes")
+        self._lock_file = None
+
+    @property
+    def enabled(self) -> bool:
+        return pa is not None and bool(self.path)
+
+    def exists(self) -> bool:
+        return self.enabled and os.path.exists(self.path)
+
+    @property
+    def is_loader(self) -> bool:
+        """Whether this process fetches and publishes the dataset itself"""
+        return self._lock_file is not None or not self.shared or not self.enabled or fcntl is None
+
+    def acquire_loader(self) -> bool:
+        """
+        Try to become the loader for this snapshot path. The lock is held
+        until the process exits, at which point another worker takes over
+        on its next refresh.
+        """
+        if self.is_loader:
+            return True
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            lock_file = open(f"{self.path}.lock", "a")
+        except OSError as e:
+            print(f"Warning: Could not open snapshot lock, loading independently: {e}")
+            self.shared = False
+            return True
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        print(f"Process {os.getpid()} is the dataset loader for {self.path}")
+        return True
+
+    def save(self, dataset: PreparedDataset) -> bool:
+        """Atomically write the dataset; returns False if it could not be written"""
+        if not self.enabled or dataset.version is None:
+            return False
+        try:
+            table = pa.Table.from_pandas(dataset.frame, preserve_index=False)
+            metadata = dict(table.schema.metadata or {})
+            metadata[self.METADATA_KEY] = json.dumps({
+                "version": dataset.version,
+                "parts": dataset.parts,
+            }).encode('utf-8')
+            table = table.replace_schema_metadata(metadata)
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp-{os.getpid()}"
+            # Uncompressed IPC file so reads can map the buffers directly
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, self.path)
+            print(f"Saved dataset snapshot {dataset.version} to {self.path}")
+            return True
+        except Exception as e:
+            print(f"Warning: Could not write dataset snapshot: {e}")
+            return False
+
+    def read_metadata(self) -> Optional[Dict[str, Any]]:
+        """Version and manifest of the snapshot, without reading any rows"""
+        if not self.exists():
+            return None
+        try:
+            with pa.memory_map(self.path, 'r') as source:
+                schema = pa.ipc.open_file(source).schema
+            return json.loads(schema.metadata[self.METADATA_KEY])
+        except Exception as e:
+            print(f"Warning: Could not read dataset snapshot: {e}")
+            return None
+
+    def load(self) -> Optional[PreparedDataset]:
+        """Memory-map the snapshot as a lazily materialized prepared dataset"""
+        if not self.exists():
+            return None
+        try:
+            # The mapping stays open for as long as the table references it
+            source = pa.memory_map(self.path, 'r')
+            table = pa.ipc.open_file(source).read_all()
+            meta = json.loads(table.schema.metadata[self.METADATA_KEY])
+            parts = {key: tuple(part) for key, part in meta.get("parts", {}).items()}
+            print(f"Mapped dataset snapshot {meta['version']} from {self.path}. Rows: {table.num_rows}")
+            return PreparedDataset.lazy(
+                table.column_names,
+                table.num_rows,
+                lambda name: self._column_to_series(table, name),
+                version=meta["version"],
+                parts=parts
+            )
+        except Exception as e:
+            print(f"Warning: Could not load dataset snapshot: {e}")
+            return None
+
+    @staticmethod
+    def _column_to_series(table: "pa.Table", name: str) -> pd.Series:
+        """Convert one snapshot column, zero-copy where Arrow allows it"""
+        field = table.schema.field(name)
+        column = table.column(name)
+        metadata = field.metadata or {}
+        if metadata.get(b"ARROW:extension:name") == b"pandas.period":
+            # Period columns come back as raw ordinals unless pandas has
+            # registered its Arrow extension types in this process
+            freq = json.loads(metadata[b"ARROW:extension:metadata"])["freq"]
+            ordinals = column.to_numpy()
+            return pd.Series(pd.arrays.PeriodArray(ordinals, dtype=pd.PeriodDtype(freq)), name=name)
+        return column.to_pandas()
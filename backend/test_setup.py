@@ -34,10 +34,10 @@ async def test():
         # Test stats
         stats = processor.process_dashboard_stats(df)
         print(f"   [OK] Stats processed successfully!")
-        print(f"   [OK] Revenue: {stats.total_revenue}")
-        print(f"   [OK] Customers: {stats.active_customers}")
-        print(f"   [OK] Growth Rate: {stats.growth_rate}")
-        print(f"   [OK] Target Progress: {stats.target_progress}")
+        print(f"   [OK] Revenue: {stats['total_revenue']}")
+        print(f"   [OK] Customers: {stats['active_customers']}")
+        print(f"   [OK] Growth Rate: {stats['growth_rate']}")
+        print(f"   [OK] Target Progress: {stats['target_progress']}")
     except Exception as e:
         print(f"   [ERROR] Error: {e}")
         import traceback